@@ -0,0 +1,274 @@
+"""Incrementally maintained analytics rollups.
+
+Write paths call `Analytics.record`, which `$inc`s counters on an hourly and
+a daily document in the `stats` collection (`_id` is `hour:YYYY-MM-DDTHH` or
+`day:YYYY-MM-DD`) in one `bulk_write`, off the request path. Dashboard
+queries then read one document per day or hour instead of scanning
+`chat_messages` and `bookings`.
+
+Because the live counters are best effort, a nightly job recomputes the
+previous day from the source collections and overwrites its rollups. The
+job is claimed through shared state so only one worker runs it. A user counts
+as active in the hour of their first chat message of the day, both live and
+in the rebuild.
+"""
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import date, datetime, time, timezone, timedelta
+from typing import Dict, List, Optional, Set
+
+from pymongo import ReplaceOne, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = [
+    "signups",
+    "anonymous_signups",
+    "active_users",
+    "chat_messages",
+    "crisis_messages",
+    "bookings_created",
+    "bookings_confirmed",
+    "revenue",
+]
+
+
+def day_key(day: str) -> str:
+    return f"day:{day}"
+
+
+def hour_key(hour: str) -> str:
+    return f"hour:{hour}"
+
+
+def _ratio(numerator: float, denominator: float) -> float:
+    return round(numerator / denominator, 4) if denominator else 0.0
+
+
+class Analytics:
+    def __init__(self, active_user_cache_size: int = 50_000):
+        self.db = None
+        self.shared_state = None
+        self.active_user_cache_size = active_user_cache_size
+        self._seen_active: "OrderedDict[str, None]" = OrderedDict()
+        self._pending: Set[asyncio.Task] = set()
+        self._nightly: Optional[asyncio.Task] = None
+
+    @staticmethod
+    async def ensure_indexes(db) -> None:
+        await db.users.create_index("created_at")
+        await db.chat_messages.create_index([("timestamp", 1), ("role", 1)])
+        await db.bookings.create_index("created_at")
+        await db.bookings.create_index([("status", 1), ("confirmed_at", 1)])
+
+    @staticmethod
+    async def backfill_confirmed_at(db) -> int:
+        """Give bookings confirmed before confirmed_at existed their creation time; a no-op once done."""
+        result = await db.bookings.update_many(
+            {"status": "confirmed", "confirmed_at": None},
+            [{"$set": {"confirmed_at": "$created_at"}}]
+        )
+        return result.modified_count
+
+    def start(self, db, shared_state, nightly_at: time = time(0, 30)) -> None:
+        self.db = db
+        self.shared_state = shared_state
+        self._nightly = asyncio.create_task(self._run_nightly(nightly_at))
+
+    async def stop(self) -> None:
+        if self._nightly:
+            self._nightly.cancel()
+        if self._pending:
+            await asyncio.wait(self._pending, timeout=5)
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def record(self, counters: Dict[str, int], psychologist_revenue: Optional[Dict[str, int]] = None, at: Optional[datetime] = None) -> None:
+        """Schedule `$inc`s on the hourly and daily rollups; never blocks the caller."""
+        self._spawn(self._write(counters, psychologist_revenue or {}, at or datetime.now(timezone.utc)))
+
+    def record_active_user(self, user_id: str, at: Optional[datetime] = None) -> None:
+        at = at or datetime.now(timezone.utc)
+        marker = f"{at.date().isoformat()}:{user_id}"
+        if marker in self._seen_active:
+            return
+        self._seen_active[marker] = None
+        if len(self._seen_active) > self.active_user_cache_size:
+            self._seen_active.popitem(last=False)
+        self._spawn(self._write_active_user(marker, at))
+
+    async def _write_active_user(self, marker: str, at: datetime) -> None:
+        # The local cache skips repeat writes on this worker; shared state dedupes across workers.
+        try:
+            first_today = await self.shared_state.add(f"active:{marker}", 1, 2 * 24 * 3600)
+        except Exception as e:
+            # Forget the marker so the user's next message retries.
+            self._seen_active.pop(marker, None)
+            logger.error(f"Failed to record active user {marker}: {str(e)}")
+            return
+        if first_today:
+            await self._write({"active_users": 1}, {}, at)
+
+    async def _write(self, counters: Dict[str, int], psychologist_revenue: Dict[str, int], at: datetime) -> None:
+        day = at.strftime("%Y-%m-%d")
+        hour = at.strftime("%Y-%m-%dT%H")
+        inc = {f"counters.{name}": value for name, value in counters.items() if value}
+        daily_inc = dict(inc)
+        daily_inc.update({f"revenue_by_psychologist.{pid}": amount for pid, amount in psychologist_revenue.items()})
+        if not daily_inc:
+            return
+        operations = [UpdateOne(
+            {"_id": day_key(day)},
+            {"$inc": daily_inc, "$setOnInsert": {"granularity": "day", "bucket": day}},
+            upsert=True
+        )]
+        if inc:
+            operations.append(UpdateOne(
+                {"_id": hour_key(hour)},
+                {"$inc": inc, "$setOnInsert": {"granularity": "hour", "bucket": hour}},
+                upsert=True
+            ))
+        try:
+            await self.db.stats.bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.error(f"Failed to record analytics {counters}: {str(e)}")
+
+    async def daily(self, start: date, end: date) -> List[dict]:
+        docs = await self.db.stats.find(
+            {"_id": {"$gte": day_key(start.isoformat()), "$lte": day_key(end.isoformat())}},
+            {"_id": 0}
+        ).sort("_id", 1).to_list(None)
+        return docs
+
+    async def hourly(self, day: date) -> List[dict]:
+        prefix = day.isoformat()
+        docs = await self.db.stats.find(
+            {"_id": {"$gte": hour_key(f"{prefix}T00"), "$lte": hour_key(f"{prefix}T23")}},
+            {"_id": 0}
+        ).sort("_id", 1).to_list(None)
+        return docs
+
+    async def summary(self, start: date, end: date) -> dict:
+        days = await self.daily(start, end)
+        totals = {name: 0 for name in COUNTERS}
+        revenue_by_psychologist: Dict[str, int] = {}
+        for doc in days:
+            for name, value in doc.get("counters", {}).items():
+                totals[name] = totals.get(name, 0) + value
+            for pid, amount in doc.get("revenue_by_psychologist", {}).items():
+                revenue_by_psychologist[pid] = revenue_by_psychologist.get(pid, 0) + amount
+        span = (end - start).days + 1
+        return {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "totals": totals,
+            "avg_daily_active_users": round(totals["active_users"] / span, 2) if span > 0 else 0.0,
+            "chats_per_day": round(totals["chat_messages"] / span, 2) if span > 0 else 0.0,
+            "crisis_rate": _ratio(totals["crisis_messages"], totals["chat_messages"]),
+            "booking_conversion": _ratio(totals["bookings_confirmed"], totals["bookings_created"]),
+            "revenue_by_psychologist": dict(sorted(revenue_by_psychologist.items(), key=lambda item: -item[1])),
+        }
+
+    async def rebuild_day(self, day: date) -> dict:
+        """Recompute one day's daily and hourly rollups from the source collections."""
+        start = day.isoformat()
+        end = (day + timedelta(days=1)).isoformat()
+        in_day = {"$gte": start, "$lt": end}
+        hour_of = lambda field: {"$substrBytes": [field, 0, 13]}
+
+        daily = {name: 0 for name in COUNTERS}
+        hourly: Dict[str, Dict[str, int]] = {}
+        revenue_by_psychologist: Dict[str, int] = {}
+
+        def add(hour: str, name: str, value: int) -> None:
+            daily[name] += value
+            counters = hourly.setdefault(hour, {})
+            counters[name] = counters.get(name, 0) + value
+
+        async for row in self.db.users.aggregate([
+            {"$match": {"created_at": in_day}},
+            {"$group": {
+                "_id": hour_of("$created_at"),
+                "signups": {"$sum": 1},
+                "anonymous": {"$sum": {"$cond": ["$is_anonymous", 1, 0]}},
+            }},
+        ]):
+            add(row["_id"], "signups", row["signups"])
+            add(row["_id"], "anonymous_signups", row["anonymous"])
+
+        async for row in self.db.chat_messages.aggregate([
+            {"$match": {"timestamp": in_day, "role": "user"}},
+            {"$group": {
+                "_id": hour_of("$timestamp"),
+                "messages": {"$sum": 1},
+                "crisis": {"$sum": {"$cond": ["$is_crisis", 1, 0]}},
+            }},
+        ]):
+            add(row["_id"], "chat_messages", row["messages"])
+            add(row["_id"], "crisis_messages", row["crisis"])
+
+        async for row in self.db.chat_messages.aggregate([
+            {"$match": {"timestamp": in_day, "role": "user"}},
+            {"$group": {"_id": "$user_id", "first_seen": {"$min": "$timestamp"}}},
+            {"$group": {"_id": hour_of("$first_seen"), "users": {"$sum": 1}}},
+        ]):
+            add(row["_id"], "active_users", row["users"])
+
+        async for row in self.db.bookings.aggregate([
+            {"$match": {"created_at": in_day}},
+            {"$group": {"_id": hour_of("$created_at"), "created": {"$sum": 1}}},
+        ]):
+            add(row["_id"], "bookings_created", row["created"])
+
+        # Served by the (status, confirmed_at) index; older bookings get confirmed_at from backfill_confirmed_at.
+        async for row in self.db.bookings.aggregate([
+            {"$match": {"status": "confirmed", "confirmed_at": in_day}},
+            {"$group": {
+                "_id": {"hour": hour_of("$confirmed_at"), "psychologist_id": "$psychologist_id"},
+                "confirmed": {"$sum": 1},
+                "revenue": {"$sum": "$amount"},
+            }},
+        ]):
+            add(row["_id"]["hour"], "bookings_confirmed", row["confirmed"])
+            add(row["_id"]["hour"], "revenue", row["revenue"])
+            pid = row["_id"]["psychologist_id"]
+            revenue_by_psychologist[pid] = revenue_by_psychologist.get(pid, 0) + row["revenue"]
+
+        operations = [ReplaceOne(
+            {"_id": day_key(start)},
+            {"granularity": "day", "bucket": start, "counters": daily, "revenue_by_psychologist": revenue_by_psychologist},
+            upsert=True
+        )]
+        operations += [
+            ReplaceOne(
+                {"_id": hour_key(hour)},
+                {"granularity": "hour", "bucket": hour, "counters": counters},
+                upsert=True
+            )
+            for hour, counters in hourly.items()
+        ]
+        await self.db.stats.delete_many({
+            "_id": {"$gte": hour_key(f"{start}T00"), "$lte": hour_key(f"{start}T23")},
+            "bucket": {"$nin": list(hourly)},
+        })
+        await self.db.stats.bulk_write(operations, ordered=False)
+        return {"day": start, "counters": daily, "hours": len(hourly)}
+
+    async def _run_nightly(self, at: time) -> None:
+        while True:
+            now = datetime.now(timezone.utc)
+            next_run = datetime.combine(now.date(), at, tzinfo=timezone.utc)
+            if next_run <= now:
+                next_run += timedelta(days=1)
+            await asyncio.sleep((next_run - now).total_seconds())
+            day = next_run.date() - timedelta(days=1)
+            try:
+                if await self.shared_state.add(f"analytics_rebuild:{day.isoformat()}", 1, 2 * 24 * 3600):
+                    result = await self.rebuild_day(day)
+                    logger.info(f"Rebuilt analytics for {result['day']}")
+            except Exception as e:
+                logger.error(f"Nightly analytics rebuild for {day} failed: {str(e)}")
@@ -0,0 +1,94 @@
+"""OTP verification throughput: legacy find/compare/delete vs OTPStore.verify.
+
+Seeds codes for --emails addresses in a scratch database, then verifies all
+of them with --concurrency concurrent tasks using each strategy. Requires a
+reachable MongoDB at MONGO_URL; the scratch database is dropped afterwards.
+
+    python benchmarks/bench_otp.py --emails 5000 --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from otp import OTPStore
+
+load_dotenv(BACKEND_DIR / '.env')
+
+
+async def seed_legacy(db, emails):
+    expires = (datetime.now(timezone.utc) + timedelta(minutes=10)).isoformat()
+    await db.otp_codes.delete_many({})
+    await db.otp_codes.insert_many([{"email": email, "otp": "123456", "expires_at": expires} for email in emails])
+
+
+async def verify_legacy(db, email, code):
+    otp_doc = await db.otp_codes.find_one({"email": email}, {"_id": 0})
+    if not otp_doc or otp_doc["otp"] != code:
+        raise ValueError("Invalid OTP")
+    expires_at = datetime.fromisoformat(otp_doc["expires_at"])
+    if expires_at < datetime.now(timezone.utc):
+        raise ValueError("OTP expired")
+    await db.otp_codes.delete_one({"email": email})
+
+
+async def seed_hashed(db, store, emails):
+    expires = datetime.now(timezone.utc) + timedelta(minutes=10)
+    await db.otp_codes.delete_many({})
+    await db.otp_codes.insert_many([
+        {"email": email, "code_hash": store.hash_code(email, "123456"), "expires_at": expires, "purge_at": expires, "attempts": 0}
+        for email in emails
+    ])
+
+
+async def run(verify, emails, concurrency):
+    queue = iter(emails)
+
+    async def worker():
+        for email in queue:
+            await verify(email, "123456")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return len(emails) / (time.perf_counter() - started)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], maxPoolSize=args.concurrency)
+    db_name = f"{os.environ.get('DB_NAME', 'saathi')}_otp_bench"
+    db = client[db_name]
+    store = OTPStore("bench-secret-" + "x" * 32)
+    emails = [f"bench{i}@example.com" for i in range(args.emails)]
+    try:
+        await OTPStore.ensure_indexes(db)
+
+        await seed_legacy(db, emails)
+        legacy = await run(lambda email, code: verify_legacy(db, email, code), emails, args.concurrency)
+
+        await seed_hashed(db, store, emails)
+        hashed = await run(lambda email, code: store.verify(db, email, code), emails, args.concurrency)
+    finally:
+        await client.drop_database(db_name)
+        client.close()
+
+    print(f"{args.emails} verifications, concurrency {args.concurrency}")
+    print(f"  legacy find+compare+delete  {legacy:10.0f} verifies/s")
+    print(f"  OTPStore.verify (1 trip)    {hashed:10.0f} verifies/s  ({hashed / legacy:.2f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+"""Serialisation benchmark for list endpoints such as GET /api/psychologists.
+
+Compares, per payload size:
+  validated+json    response_model validation, jsonable_encoder, stdlib json (FastAPI default)
+  validated+orjson  the same validation, rendered with ORJSONResponse
+  trusted+orjson    projected Mongo documents rendered directly with ORJSONResponse
+
+    python benchmarks/bench_serialization.py --sizes 20 200 2000
+"""
+import argparse
+import sys
+import timeit
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+
+from server import Psychologist
+
+
+def make_docs(n: int) -> List[dict]:
+    now = datetime.now(timezone.utc).isoformat()
+    return [
+        {
+            "psychologist_id": f"psy_{uuid.uuid4().hex[:12]}",
+            "name": f"Dr. Psychologist {i}",
+            "email": f"psy{i}@example.com",
+            "credentials": "M.Phil Clinical Psychology, RCI Licensed",
+            "specialization": ["Marriage Counseling", "Breakup Recovery", "Family Therapy"],
+            "years_experience": 3 + i % 20,
+            "pricing": 800 + (i % 10) * 100,
+            "rating": 4.0 + (i % 10) / 10,
+            "bio": "Helps couples and individuals navigate relationship challenges with empathy. " * 3,
+            "picture": None,
+            "approved": True,
+            "created_at": now,
+        }
+        for i in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 200, 2000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    adapter = TypeAdapter(List[Psychologist])
+    strategies = {
+        "validated+json": lambda docs: JSONResponse(jsonable_encoder(adapter.validate_python(docs))).body,
+        "validated+orjson": lambda docs: ORJSONResponse(jsonable_encoder(adapter.validate_python(docs))).body,
+        "trusted+orjson": lambda docs: ORJSONResponse(docs).body,
+    }
+
+    print(f"{'items':>6}  {'strategy':<18} {'ms/response':>12} {'speedup':>8}")
+    for size in args.sizes:
+        docs = make_docs(size)
+        number = max(1, 2000 // size)
+        baseline = None
+        for name, render in strategies.items():
+            best = min(timeit.repeat(lambda: render(docs), number=number, repeat=args.repeat)) / number
+            baseline = baseline or best
+            print(f"{size:>6}  {name:<18} {best * 1000:12.3f} {baseline / best:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
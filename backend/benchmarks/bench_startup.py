@@ -0,0 +1,135 @@
+"""Startup benchmark: import time of server.py and latency to the first request.
+
+Each sample runs in a fresh interpreter, the way an autoscaled worker starts.
+The first-request phase runs the app lifespan, so MONGO_URL must point at a
+reachable MongoDB. `first_sdk_ms` is what a chat, email or payment request
+arriving right after readiness waits for its SDK: the rest of the background
+prewarm, or the full import with --no-prewarm.
+
+--baseline REV runs the same samples against the backend at a git revision
+(e.g. the commit before the lazy SDK loading) and prints both side by side.
+
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --runs 5 --baseline fc6c36a
+    python benchmarks/bench_startup.py --no-prewarm
+    python benchmarks/bench_startup.py --import-only
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+SAMPLE = r"""
+import asyncio, json, sys, time
+sys.path.insert(0, {backend!r})
+t0 = time.perf_counter()
+import server
+t1 = time.perf_counter()
+result = {{"import_ms": (t1 - t0) * 1000}}
+if {first_request}:
+    import httpx
+    async def first_request():
+        # Older revisions build the app at import time and have no integrations module.
+        app = server.create_app() if hasattr(server, "create_app") else server.app
+        integrations = getattr(server, "integrations", None)
+        t2 = time.perf_counter()
+        async with app.router.lifespan_context(app):
+            t3 = time.perf_counter()
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+                resp = await c.get("/api/")
+                resp.raise_for_status()
+            t4 = time.perf_counter()
+            if integrations is not None:
+                for getter in (integrations.get_llm_chat, integrations.get_resend, integrations.get_razorpay_client):
+                    try:
+                        await integrations.load(getter)
+                    except ImportError:
+                        pass
+            t5 = time.perf_counter()
+        result["lifespan_ms"] = (t3 - t2) * 1000
+        result["first_request_ms"] = (t4 - t3) * 1000
+        result["ready_ms"] = (t4 - t0) * 1000
+        result["first_sdk_ms"] = (t5 - t4) * 1000
+    asyncio.run(first_request())
+print(json.dumps(result))
+"""
+
+SDK_SAMPLE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+try:
+    __import__({module!r})
+    print(json.dumps((time.perf_counter() - t0) * 1000))
+except ImportError:
+    print("null")
+"""
+
+DEFERRED_SDKS = ["emergentintegrations.llm.chat", "resend", "razorpay"]
+
+
+def run_python(code: str, env: dict = None, cwd: Path = BACKEND_DIR) -> str:
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True, check=True,
+        env={**os.environ, **(env or {})}
+    )
+    return out.stdout.strip().splitlines()[-1]
+
+
+def export_backend(rev: str, into: Path) -> Path:
+    archive = subprocess.run(
+        ["git", "archive", "--format=tar", rev, "backend"], cwd=BACKEND_DIR.parent, capture_output=True, check=True
+    ).stdout
+    tar_path = into / "backend.tar"
+    tar_path.write_bytes(archive)
+    with tarfile.open(tar_path) as tar:
+        tar.extractall(into)
+    return into / "backend"
+
+
+def collect(backend: Path, runs: int, first_request: bool, env: dict) -> list:
+    code = SAMPLE.format(backend=str(backend), first_request=first_request)
+    return [json.loads(run_python(code, env, cwd=backend)) for _ in range(runs)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-only", action="store_true", help="skip the lifespan and first request")
+    parser.add_argument("--no-prewarm", action="store_true", help="run with PREWARM_INTEGRATIONS=false")
+    parser.add_argument("--baseline", metavar="REV", help="also measure the backend at this git revision")
+    args = parser.parse_args()
+
+    env = {"PREWARM_INTEGRATIONS": "false"} if args.no_prewarm else {}
+    columns = {"current": collect(BACKEND_DIR, args.runs, not args.import_only, env)}
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = export_backend(args.baseline, Path(tmp))
+            columns[args.baseline] = collect(backend, args.runs, not args.import_only, env)
+
+    prewarm = "off" if args.no_prewarm else "on"
+    print(f"server.py startup over {args.runs} fresh interpreters, prewarm {prewarm} (median / max, ms)")
+    print(f"  {'':<18}" + "".join(f"{name:>20}" for name in columns))
+    keys = list(dict.fromkeys(key for samples in columns.values() for key in samples[0]))
+    for key in keys:
+        cells = []
+        for samples in columns.values():
+            values = [s[key] for s in samples if key in s]
+            cells.append(f"{statistics.median(values):9.1f} {max(values):9.1f}" if values else f"{'-':>19}")
+        print(f"  {key:<18}" + "".join(f"{cell:>20}" for cell in cells))
+
+    print("deferred SDK import cost (ms, paid by the background prewarm, or on first use without it)")
+    for module in DEFERRED_SDKS:
+        cost = json.loads(run_python(SDK_SAMPLE.format(module=module)))
+        print(f"  {module:<32} {'not installed' if cost is None else f'{cost:8.1f}'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""WebSocket chat transport.
+
+One authenticated connection carries any number of chat sessions. Frames
+are JSON text frames with a `type`; binary frames get a `bad_frame` error:
+
+client -> server
+    {"type": "message", "session_id": ..., "message": ..., "request_id": optional}
+    {"type": "ping"} / {"type": "pong"}
+
+server -> client
+    {"type": "ready", "user_id": ...}
+    {"type": "typing", "session_id": ..., "active": bool}
+    {"type": "token", "session_id": ..., "request_id": ..., "delta": ...}
+    {"type": "done", "session_id": ..., "request_id": ..., **chat turn result minus "response"}
+    {"type": "error", "code": ..., "detail": ..., ...}
+    {"type": "ping"} / {"type": "pong"}
+
+Turns for the same session run in order; different sessions run
+concurrently up to `max_inflight`. Outgoing frames go through a bounded
+queue, so a slow reader slows token streaming instead of growing memory.
+Every `revalidate_interval` seconds the heartbeat re-checks the session
+with `revalidate` and closes the socket with 4401 once it is no longer valid.
+"""
+import asyncio
+import logging
+import re
+import time
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+import orjson
+from fastapi import WebSocket, WebSocketDisconnect
+
+logger = logging.getLogger(__name__)
+
+ChatTurn = Callable[[object, str, str], Awaitable[dict]]
+SessionCheck = Callable[[], Awaitable[bool]]
+
+CHUNK_RE = re.compile(r"\S+\s*")
+
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def stream_chunks(text: str, chunk_chars: int = 24):
+    chunk = ""
+    for piece in CHUNK_RE.findall(text):
+        chunk += piece
+        if len(chunk) >= chunk_chars:
+            yield chunk
+            chunk = ""
+    if chunk:
+        yield chunk
+
+
+class ChatConnection:
+    def __init__(
+        self,
+        websocket: WebSocket,
+        user,
+        run_turn: ChatTurn,
+        max_inflight: int = 4,
+        send_queue_size: int = 256,
+        heartbeat_interval: float = 20.0,
+        idle_timeout: float = 60.0,
+        revalidate: Optional[SessionCheck] = None,
+        revalidate_interval: float = 300.0,
+    ):
+        self.websocket = websocket
+        self.user = user
+        self.run_turn = run_turn
+        self.max_inflight = max_inflight
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.revalidate = revalidate
+        self.revalidate_interval = revalidate_interval
+        self._outgoing: asyncio.Queue = asyncio.Queue(maxsize=send_queue_size)
+        self._session_locks: Dict[str, asyncio.Lock] = {}
+        self._turns: Set[asyncio.Task] = set()
+        self._last_seen = time.monotonic()
+        self._last_validated = self._last_seen
+        self._closed = False
+
+    async def send(self, frame: dict) -> None:
+        if not self._closed:
+            await self._outgoing.put(frame)
+
+    async def serve(self) -> None:
+        sender = asyncio.create_task(self._sender())
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            await self.send({"type": "ready", "user_id": self.user.user_id})
+            await self._receiver()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self._closed = True
+            heartbeat.cancel()
+            sender.cancel()
+            if self._turns:
+                # Turns already running still persist their messages; their output is dropped.
+                task = asyncio.create_task(self._discard_until_idle())
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
+
+    async def _sender(self) -> None:
+        try:
+            while True:
+                frame = await self._outgoing.get()
+                await self.websocket.send_text(orjson.dumps(frame).decode())
+        except (WebSocketDisconnect, RuntimeError):
+            self._closed = True
+
+    async def _discard_until_idle(self) -> None:
+        while self._turns or not self._outgoing.empty():
+            try:
+                await asyncio.wait_for(self._outgoing.get(), 1.0)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            if time.monotonic() - self._last_seen > self.idle_timeout:
+                logger.info(f"Closing idle chat websocket for {self.user.user_id}")
+                self._closed = True
+                await self.websocket.close(code=4408)
+                return
+            if self.revalidate and time.monotonic() - self._last_validated >= self.revalidate_interval:
+                valid = await self._session_valid()
+                if valid is False:
+                    logger.info(f"Closing chat websocket for {self.user.user_id}: session no longer valid")
+                    self._closed = True
+                    await self.websocket.close(code=4401, reason="Session expired")
+                    return
+                if valid:
+                    self._last_validated = time.monotonic()
+            await self.send({"type": "ping"})
+
+    async def _session_valid(self) -> Optional[bool]:
+        try:
+            return await self.revalidate()
+        except Exception as e:
+            # A database hiccup should not drop every open socket; retry on the next beat.
+            logger.warning(f"Session re-validation failed for {self.user.user_id}: {str(e)}")
+            return None
+
+    async def _receiver(self) -> None:
+        while True:
+            message = await self.websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            self._last_seen = time.monotonic()
+            raw = message.get("text")
+            if raw is None:
+                await self.send({"type": "error", "code": "bad_frame", "detail": "Binary frames are not supported"})
+                continue
+            try:
+                frame = orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                await self.send({"type": "error", "code": "bad_frame", "detail": "Frames must be JSON objects"})
+                continue
+            if not isinstance(frame, dict):
+                await self.send({"type": "error", "code": "bad_frame", "detail": "Frames must be JSON objects"})
+                continue
+            kind = frame.get("type")
+            if kind == "ping":
+                await self.send({"type": "pong"})
+            elif kind == "pong":
+                continue
+            elif kind == "message":
+                await self._start_turn(frame)
+            else:
+                await self.send({"type": "error", "code": "unknown_type", "detail": f"Unknown frame type: {kind}"})
+
+    async def _start_turn(self, frame: dict) -> None:
+        session_id = frame.get("session_id")
+        message = frame.get("message")
+        request_id = frame.get("request_id")
+        if not isinstance(session_id, str) or not session_id or not isinstance(message, str) or not message.strip():
+            await self.send({
+                "type": "error", "code": "bad_message", "request_id": request_id,
+                "detail": "session_id and message are required"
+            })
+            return
+        if len(self._turns) >= self.max_inflight:
+            await self.send({
+                "type": "error", "code": "busy", "session_id": session_id, "request_id": request_id,
+                "detail": "Too many messages in flight on this connection"
+            })
+            return
+        task = asyncio.create_task(self._turn(session_id, message, request_id))
+        self._turns.add(task)
+        task.add_done_callback(self._turns.discard)
+
+    async def _turn(self, session_id: str, message: str, request_id: Optional[str]) -> None:
+        lock = self._session_locks.setdefault(session_id, asyncio.Lock())
+        async with lock:
+            await self.send({"type": "typing", "session_id": session_id, "active": True})
+            try:
+                result = await self.run_turn(self.user, session_id, message)
+            except Exception as e:
+                logger.error(f"Chat turn failed over websocket: {str(e)}")
+                frame = {
+                    "type": "error", "code": "chat_failed", "session_id": session_id, "request_id": request_id,
+                    "detail": "Failed to get a response"
+                }
+                # A failed crisis turn still carries the helplines (HTTPException detail from run_turn).
+                detail = getattr(e, "detail", None)
+                if isinstance(detail, dict):
+                    frame.update({key: value for key, value in detail.items() if key != "message"})
+                await self.send(frame)
+                return
+            finally:
+                await self.send({"type": "typing", "session_id": session_id, "active": False})
+            for delta in stream_chunks(result["response"]):
+                await self.send({"type": "token", "session_id": session_id, "request_id": request_id, "delta": delta})
+            # The reply already went out as tokens; don't send it a second time.
+            summary = {key: value for key, value in result.items() if key != "response"}
+            await self.send({"type": "done", "session_id": session_id, "request_id": request_id, **summary})
@@ -0,0 +1,157 @@
+"""Crisis escalation: queue, persistence, live admin feed and on-call alerts.
+
+`chat_with_ai` publishes crisis messages onto an in-process queue and moves
+on. A consumer task persists each event to the indexed `crisis_events`
+collection, wakes the admin feeds on this worker and alerts on-call
+psychologists at most once per user and chat session per dedupe window. The
+dedupe claim lives in shared state, so the limit holds across workers. It
+is released again if nobody was actually alerted, so the next crisis
+message in that session retries.
+
+Admin feeds read from `crisis_events` rather than from the queue, so a feed
+on one worker also sees events published on the others: it wakes
+immediately for local events and polls every few seconds for remote ones.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Returns whether anyone was alerted; raises if delivery failed.
+Notifier = Callable[[dict], Awaitable[bool]]
+
+
+class CrisisEscalator:
+    def __init__(
+        self,
+        queue_size: int = 1000,
+        dedupe_window: float = 3600,
+        poll_interval: float = 2.0,
+        lookback: float = 30.0,
+    ):
+        self.dedupe_window = dedupe_window
+        self.poll_interval = poll_interval
+        self.lookback = lookback
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._subscribers: Set[asyncio.Event] = set()
+        self._consumer: Optional[asyncio.Task] = None
+        self._overflow: Set[asyncio.Task] = set()
+        self.db = None
+        self.shared_state = None
+        self.notifier: Optional[Notifier] = None
+
+    @staticmethod
+    async def ensure_indexes(db) -> None:
+        await db.crisis_events.create_index("event_id", unique=True)
+        await db.crisis_events.create_index([("created_at", -1)])
+        await db.crisis_events.create_index([("status", 1), ("created_at", -1)])
+        await db.crisis_events.create_index([("session_id", 1), ("created_at", -1)])
+
+    def start(self, db, shared_state, notifier: Optional[Notifier] = None) -> None:
+        self.db = db
+        self.shared_state = shared_state
+        self.notifier = notifier
+        self._consumer = asyncio.create_task(self._consume())
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping {self._queue.qsize()} unprocessed crisis events on shutdown")
+        if self._consumer:
+            self._consumer.cancel()
+        for event in list(self._subscribers):
+            event.set()
+
+    def publish(self, session_id: str, user_id: str, message_id: str, content: str, keywords: List[str]) -> dict:
+        event = {
+            "event_id": f"crisis_{uuid.uuid4().hex[:12]}",
+            "session_id": session_id,
+            "user_id": user_id,
+            "message_id": message_id,
+            "excerpt": content[:280],
+            "keywords": keywords,
+            "status": "open",
+            "notified": False,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Never drop a crisis event: handle it outside the queue instead.
+            task = asyncio.create_task(self._handle(event))
+            self._overflow.add(task)
+            task.add_done_callback(self._overflow.discard)
+        return event
+
+    async def _consume(self) -> None:
+        while True:
+            event = await self._queue.get()
+            try:
+                await self._handle(event)
+            except Exception as e:
+                logger.error(f"Failed to process crisis event {event['event_id']}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    async def _handle(self, event: dict) -> None:
+        await self.db.crisis_events.insert_one(event.copy())
+        for subscriber in self._subscribers:
+            subscriber.set()
+        if self.notifier is None:
+            return
+        # session_id comes from the client, so the claim is scoped to the user as well.
+        dedupe_key = f"crisis_notified:{event['user_id']}:{event['session_id']}"
+        claim = await self.shared_state.try_lock(dedupe_key, self.dedupe_window)
+        if claim is None:
+            return
+        try:
+            notified = await self.notifier(event)
+        except Exception as e:
+            logger.error(f"Failed to notify on-call psychologists for {event['event_id']}: {str(e)}")
+            notified = False
+        if not notified:
+            await self.shared_state.unlock(dedupe_key, claim)
+            return
+        await self.db.crisis_events.update_one({"event_id": event["event_id"]}, {"$set": {"notified": True}})
+
+    async def feed(self, backfill: int = 20, heartbeat: float = 15.0) -> AsyncIterator[Optional[dict]]:
+        """Yield crisis events as they arrive, oldest first; yields None as a heartbeat."""
+        wake = asyncio.Event()
+        self._subscribers.add(wake)
+        try:
+            recent = await self.db.crisis_events.find({}, {"_id": 0}).sort("created_at", -1).limit(backfill).to_list(backfill)
+            seen = {}
+            cursor = datetime.now(timezone.utc).isoformat()
+            for event in reversed(recent):
+                seen[event["event_id"]] = event["created_at"]
+                yield event
+            idle = 0.0
+            while True:
+                try:
+                    await asyncio.wait_for(wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                wake.clear()
+                if self._consumer is None or self._consumer.done():
+                    return
+                # Re-read a short window so events inserted late by other workers are not missed.
+                since = (datetime.fromisoformat(cursor) - timedelta(seconds=self.lookback)).isoformat()
+                cursor = datetime.now(timezone.utc).isoformat()
+                events = await self.db.crisis_events.find(
+                    {"created_at": {"$gte": since}}, {"_id": 0}
+                ).sort("created_at", 1).to_list(None)
+                fresh = [event for event in events if event["event_id"] not in seen]
+                for event in fresh:
+                    seen[event["event_id"]] = event["created_at"]
+                    yield event
+                seen = {event_id: at for event_id, at in seen.items() if at >= since}
+                idle = 0.0 if fresh else idle + self.poll_interval
+                if idle >= heartbeat:
+                    idle = 0.0
+                    yield None
+        finally:
+            self._subscribers.discard(wake)
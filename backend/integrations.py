@@ -0,0 +1,69 @@
+"""Lazily loaded third-party SDKs.
+
+`emergentintegrations`, `resend` and `razorpay` together dominate the import
+time of server.py, so they are imported on first use instead of at module
+import. The app lifespan calls `start_prewarm`, which imports them on a
+background thread while the worker already reports ready. Request paths get
+an SDK through `await load(getter)`: while the prewarm is still running it
+waits for it without blocking the event loop, so nothing imports the same
+SDK twice or sits on the import lock. With PREWARM_INTEGRATIONS=false, the
+first request that needs an SDK pays its import cost on the event loop.
+
+The getters are not thread-safe on their own; `load` is what serialises
+them against the prewarm thread.
+"""
+import asyncio
+import concurrent.futures
+import logging
+import os
+from functools import lru_cache
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+_prewarm: Optional[concurrent.futures.Future] = None
+
+
+@lru_cache(maxsize=None)
+def get_resend():
+    import resend
+    resend.api_key = os.environ.get('RESEND_API_KEY')
+    return resend
+
+
+@lru_cache(maxsize=None)
+def get_razorpay_client():
+    import razorpay
+    return razorpay.Client(auth=(os.environ.get('RAZORPAY_KEY_ID'), os.environ.get('RAZORPAY_KEY_SECRET')))
+
+
+@lru_cache(maxsize=None)
+def get_llm_chat():
+    from emergentintegrations.llm.chat import LlmChat, UserMessage
+    return LlmChat, UserMessage
+
+
+def prewarm():
+    for loader in (get_llm_chat, get_resend, get_razorpay_client):
+        try:
+            loader()
+        except Exception as e:
+            logger.warning(f"Failed to prewarm {loader.__name__}: {str(e)}")
+
+
+def start_prewarm() -> concurrent.futures.Future:
+    global _prewarm
+    if _prewarm is None:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="sdk-prewarm")
+        _prewarm = executor.submit(prewarm)
+        executor.shutdown(wait=False)
+    return _prewarm
+
+
+async def load(getter: Callable[[], T]) -> T:
+    if _prewarm is not None and not _prewarm.done():
+        # Shielded so a cancelled request cannot cancel the shared prewarm.
+        await asyncio.shield(asyncio.wrap_future(_prewarm))
+    return getter()
@@ -0,0 +1,217 @@
+"""Language detection, multilingual crisis matching and cached translations.
+
+Everything on the per-turn hot path is local. Detection uses Unicode script
+ranges, plus common romanised Hindi words to spot Hinglish. The crisis check
+runs on NFKC/casefolded text against English, Hinglish and per-script
+keyword lists, so it never waits on a translation. Replies are steered into
+the user's language through the system prompt. Static content (the
+helpline message, story snippets) is translated through a pluggable backend
+and kept in an LRU keyed by (language, text). Concurrent misses for the same
+key share one backend call.
+"""
+import logging
+import re
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+ENGLISH = "en"
+HINGLISH = "hi-Latn"
+
+LANGUAGE_NAMES = {
+    "en": "English",
+    "hi": "Hindi (Devanagari script)",
+    HINGLISH: "Hinglish (Hindi written in Roman script, mixed with English)",
+    "bn": "Bengali",
+    "pa": "Punjabi (Gurmukhi script)",
+    "gu": "Gujarati",
+    "or": "Odia",
+    "ta": "Tamil",
+    "te": "Telugu",
+    "kn": "Kannada",
+    "ml": "Malayalam",
+}
+
+SCRIPT_RANGES = [
+    (0x0900, 0x097F, "hi"),
+    (0x0980, 0x09FF, "bn"),
+    (0x0A00, 0x0A7F, "pa"),
+    (0x0A80, 0x0AFF, "gu"),
+    (0x0B00, 0x0B7F, "or"),
+    (0x0B80, 0x0BFF, "ta"),
+    (0x0C00, 0x0C7F, "te"),
+    (0x0C80, 0x0CFF, "kn"),
+    (0x0D00, 0x0D7F, "ml"),
+]
+
+# Words that are also common in English ("main", "hum", "dil") are left out so English text never scores.
+HINGLISH_MARKERS = frozenset("""
+hai hain nahi nahin kya kyu kyun mujhe mera meri mere tum tumhe aap humne humko yaar bhai
+kaise kaisa kuch bahut bohot accha acha thik theek haan nhi raha rahi rahe gaya gayi karna karta
+karti sakta sakti chahta chahti pyaar pyar shaadi gharwale dukh samajh lagta hoon hu
+""".split())
+
+CRISIS_KEYWORDS_BY_LANGUAGE = {
+    HINGLISH: [
+        "khudkushi", "khud kushi", "aatmhatya", "atmahatya", "marna chahta", "marna chahti", "marna hai",
+        "mar jana chahta", "mar jana chahti", "mar jaana chahta", "mar jaana chahti", "mar jana hai", "mar jaana hai",
+        "jeena nahi chahta", "jeena nahi chahti", "jina nahi chahta", "jina nahi chahti",
+        "khud ko maar", "khud ko nuksan", "apni jaan le", "suicide kar", "zindagi khatam",
+    ],
+    "hi": [
+        "आत्महत्या", "खुदकुशी", "ख़ुदकुशी", "मरना चाहता", "मरना चाहती", "मरना है", "मर जाना चाहता", "मर जाना चाहती", "मर जाना है",
+        "जीना नहीं चाहता", "जीना नहीं चाहती", "खुद को मार", "खुद को नुकसान", "अपनी जान ले", "ज़िंदगी खत्म",
+    ],
+    "bn": ["আত্মহত্যা", "মরে যেতে চাই", "বাঁচতে চাই না"],
+    "pa": ["ਖੁਦਕੁਸ਼ੀ", "ਆਤਮਹੱਤਿਆ", "ਮਰਨਾ ਚਾਹੁੰਦਾ", "ਮਰਨਾ ਚਾਹੁੰਦੀ"],
+    "gu": ["આત્મહત્યા", "મરી જવું છે", "જીવવું નથી"],
+    "or": ["ଆତ୍ମହତ୍ୟା"],
+    "ta": ["தற்கொலை", "சாக வேண்டும்", "வாழ விரும்பவில்லை"],
+    "te": ["ఆత్మహత్య", "చనిపోవాలని"],
+    "kn": ["ಆತ್ಮಹತ್ಯೆ", "ಸಾಯಬೇಕು"],
+    "ml": ["ആത്മഹത്യ", "മരിക്കണം"],
+}
+
+_SPACE_RE = re.compile(r"\s+")
+_WORD_RE = re.compile(r"[a-z]+")
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = text.replace("\u200c", "").replace("\u200d", "")
+    text = "".join(" " if unicodedata.category(char)[0] in "PS" else char for char in text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def detect_language(text: str, hinglish_threshold: float = 0.15) -> str:
+    counts: Dict[str, int] = {}
+    latin = 0
+    for char in text:
+        code = ord(char)
+        if char.isascii():
+            latin += char.isalpha()
+            continue
+        for low, high, language in SCRIPT_RANGES:
+            if low <= code <= high:
+                counts[language] = counts.get(language, 0) + 1
+                break
+    if counts:
+        language, count = max(counts.items(), key=lambda item: item[1])
+        if count >= latin * 0.3:
+            return language
+    words = _WORD_RE.findall(text.lower())
+    if words:
+        markers = sum(word in HINGLISH_MARKERS for word in words)
+        distinct = len(HINGLISH_MARKERS.intersection(words))
+        if distinct >= 2 and markers / len(words) >= hinglish_threshold:
+            return HINGLISH
+    return ENGLISH
+
+
+def crisis_matches(text: str, language: str, english_keywords: Iterable[str]) -> List[str]:
+    normalized = normalize(text)
+    # Users switch scripts mid-message, so English and Hinglish are always checked.
+    keywords = list(english_keywords) + CRISIS_KEYWORDS_BY_LANGUAGE[HINGLISH]
+    if language not in (ENGLISH, HINGLISH):
+        keywords += CRISIS_KEYWORDS_BY_LANGUAGE.get(language, [])
+    return [keyword for keyword in keywords if normalize(keyword) in normalized]
+
+
+class TranslationBackend:
+    async def translate(self, text: str, target: str) -> str:
+        raise NotImplementedError
+
+
+class LocalTranslationBackend(TranslationBackend):
+    """Phrase-table stand-in for tests and offline development; unknown text is returned unchanged."""
+
+    def __init__(self, phrases: Optional[Dict[Tuple[str, str], str]] = None):
+        self.phrases = dict(phrases or {})
+        self.calls = 0
+
+    async def translate(self, text: str, target: str) -> str:
+        self.calls += 1
+        return self.phrases.get((target, text), text)
+
+
+class LlmTranslationBackend(TranslationBackend):
+    def __init__(self, api_key: str, load_llm_chat, provider: str = "openai", model: str = "gpt-5.2"):
+        self.api_key = api_key
+        self.load_llm_chat = load_llm_chat
+        self.provider = provider
+        self.model = model
+
+    async def translate(self, text: str, target: str) -> str:
+        LlmChat, UserMessage = await self.load_llm_chat()
+        chat = LlmChat(
+            api_key=self.api_key,
+            session_id=f"translate_{target}",
+            system_message=(
+                f"Translate the user's text into {LANGUAGE_NAMES.get(target, target)}. "
+                "Keep names, phone numbers and formatting unchanged. Reply with the translation only."
+            )
+        ).with_model(self.provider, self.model)
+        return (await chat.send_message(UserMessage(text=text))).strip()
+
+
+class LanguageLayer:
+    def __init__(self, backend: TranslationBackend, cache_size: int = 2048):
+        self.backend = backend
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._single_flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    def system_prompt(self, base_prompt: str, language: str) -> str:
+        if language == ENGLISH:
+            return base_prompt
+        key = (language, base_prompt)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        return self._remember(key, (
+            f"{base_prompt}\n\nThe user is writing in {LANGUAGE_NAMES.get(language, language)}. "
+            "Reply in the same language and script the user uses."
+        ))
+
+    def _remember(self, key: Tuple[str, str], value: str) -> str:
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+        self._cache[key] = value
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return value
+
+    async def localize(self, text: str, language: str) -> str:
+        if language == ENGLISH or not text:
+            return text
+        key = (language, text)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return cached
+        self.misses += 1
+        try:
+            translated = await self._single_flight.do("translate", key, lambda: self.backend.translate(text, language))
+        except Exception as e:
+            logger.warning(f"Translation to {language} failed, falling back to English: {str(e)}")
+            return text
+        return self._remember(key, translated)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "translations": self._single_flight.stats(),
+        }
@@ -0,0 +1,125 @@
+"""Email OTP codes: hashed storage, attempt tracking and lockout.
+
+Codes are stored only as an HMAC keyed with a dedicated server secret
+(`OTP_SECRET`), so a database read never reveals a usable code: with only
+900k possible codes, the key must not be shared with anything else or be
+guessable. Comparison happens inside MongoDB as an
+equality match on that digest, so Python-side timing reveals nothing about
+the code. A correct code is consumed with a single `find_one_and_delete`. A
+wrong one increments `attempts` atomically, and after `max_attempts` the
+email is locked out for `lockout`. A TTL index on `purge_at` removes
+documents once both the code and any lockout have expired.
+"""
+import hashlib
+import hmac
+import secrets
+from datetime import datetime, timezone, timedelta
+from typing import Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+MIN_SECRET_BYTES = 32
+
+
+class OTPError(Exception):
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+class OTPStore:
+    def __init__(
+        self,
+        secret: Optional[str],
+        ttl: timedelta = timedelta(minutes=10),
+        max_attempts: int = 5,
+        lockout: timedelta = timedelta(minutes=15),
+    ):
+        if not secret or len(secret.encode()) < MIN_SECRET_BYTES:
+            raise ValueError(f"OTP_SECRET must be set to at least {MIN_SECRET_BYTES} bytes")
+        self._secret = secret.encode()
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+        self.lockout = lockout
+
+    @staticmethod
+    def generate_code() -> str:
+        return str(100000 + secrets.randbelow(900000))
+
+    def hash_code(self, email: str, code: str) -> str:
+        return hmac.new(self._secret, f"{email.lower()}:{code.strip()}".encode(), hashlib.sha256).hexdigest()
+
+    @staticmethod
+    async def ensure_indexes(db) -> None:
+        await db.otp_codes.create_index("email", unique=True)
+        await db.otp_codes.create_index("purge_at", expireAfterSeconds=0)
+
+    async def issue(self, db, email: str) -> str:
+        now = datetime.now(timezone.utc)
+        code = self.generate_code()
+        expires_at = now + self.ttl
+        try:
+            await db.otp_codes.update_one(
+                {"email": email, "locked_until": {"$not": {"$gt": now}}},
+                {
+                    "$set": {
+                        "code_hash": self.hash_code(email, code),
+                        "expires_at": expires_at,
+                        "purge_at": expires_at,
+                        "attempts": 0,
+                    },
+                    "$unset": {"otp": "", "locked_until": ""},
+                },
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # The filter only misses an existing document when the email is locked out.
+            raise OTPError("Too many failed attempts, please try again later", status_code=429)
+        return code
+
+    async def verify(self, db, email: str, code: str) -> None:
+        now = datetime.now(timezone.utc)
+        consumed = await db.otp_codes.find_one_and_delete(
+            {
+                "email": email,
+                "code_hash": self.hash_code(email, code),
+                "expires_at": {"$gt": now},
+                "attempts": {"$lt": self.max_attempts},
+                "locked_until": {"$not": {"$gt": now}},
+            },
+            projection={"_id": 1},
+        )
+        if consumed:
+            return
+
+        lock_until = now + self.lockout
+        doc = await db.otp_codes.find_one_and_update(
+            {"email": email},
+            [
+                {"$set": {"attempts": {"$add": [{"$ifNull": ["$attempts", 0]}, 1]}}},
+                {"$set": {"locked_until": {"$cond": [
+                    {"$gte": ["$attempts", self.max_attempts]},
+                    {"$ifNull": ["$locked_until", lock_until]},
+                    "$locked_until",
+                ]}}},
+                {"$set": {"purge_at": {"$max": ["$purge_at", "$locked_until"]}}},
+            ],
+            projection={"_id": 0, "expires_at": 1, "locked_until": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if not doc:
+            raise OTPError("OTP not found")
+        locked_until = doc.get("locked_until")
+        if locked_until and _aware(locked_until) > now:
+            raise OTPError("Too many failed attempts, please try again later", status_code=429)
+        expires_at = doc.get("expires_at")
+        if not isinstance(expires_at, datetime) or _aware(expires_at) <= now:
+            raise OTPError("OTP expired")
+        raise OTPError("Invalid OTP")
+
+
+def _aware(value: datetime) -> datetime:
+    # Motor returns naive UTC datetimes unless the client is tz_aware.
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
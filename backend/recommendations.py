@@ -0,0 +1,181 @@
+"""Psychologist recommendations from chat topics.
+
+Chat messages and psychologist specializations are mapped onto the same
+small set of relationship topics with keyword patterns. The approved
+catalogue is held per worker as NumPy arrays (topic matrix, rating, price,
+upcoming booking load), so ranking is a handful of vector operations and
+never touches the `psychologists` collection.
+"""
+import asyncio
+import logging
+import re
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Keywords match whole words; a trailing "*" marks a deliberate stem that also matches longer words.
+TOPIC_KEYWORDS = {
+    "breakup": ["breakup", "breakups", "break up", "broke up", "broken up", "heartbreak", "heartbroken", "dumped", "my ex", "moving on", "move on"],
+    "marriage_conflict": ["marriage", "marriages", "married", "marital", "husband", "wife", "spouse", "divorce*", "as a couple", "couples", "in-laws", "in laws"],
+    "family_pressure": ["parent", "parents", "family", "families", "arranged", "rishta", "rishtas", "mother", "father", "mom", "dad", "in-laws", "in laws", "society", "pressure*"],
+    "trust_issues": ["cheat*", "affair", "affairs", "trust*", "lying", "lied", "lies", "jealous*", "suspicious", "betray*"],
+    "compatibility": ["compatib*", "kundli", "horoscope*", "different values", "long distance", "long-distance", "inter-caste", "intercaste", "interfaith", "premarital", "pre-marital"],
+    "communication": ["argu*", "fight*", "fought", "communicat*", "misunderstand*", "ignore", "ignores", "ignored", "ignoring", "silent treatment", "conflict*"],
+    "loneliness_stress": ["lonely", "loneliness", "alone", "anxious", "anxiety", "stress*", "depress*", "sad", "sadness", "overthink*", "self-esteem", "self esteem"],
+    "grief": ["grief", "grieve", "grieving", "passed away", "died", "death", "bereave*", "loss of"],
+}
+TOPICS = list(TOPIC_KEYWORDS)
+
+
+def _keyword_pattern(keyword: str) -> str:
+    return re.escape(keyword[:-1]) if keyword.endswith("*") else re.escape(keyword) + r"\b"
+
+
+_TOPIC_PATTERNS = {
+    topic: re.compile(r"\b(?:" + "|".join(_keyword_pattern(k) for k in keywords) + ")", re.IGNORECASE)
+    for topic, keywords in TOPIC_KEYWORDS.items()
+}
+
+SCORE_WEIGHTS = {"topic": 0.55, "rating": 0.2, "price": 0.1, "availability": 0.15}
+PUBLIC_FIELDS = ["psychologist_id", "name", "credentials", "specialization", "years_experience", "pricing", "rating", "bio", "picture"]
+
+
+def topic_vector(texts: Iterable[str], decay: float = 0.85) -> np.ndarray:
+    """Topic weights for `texts` (newest first); older texts count for less. Sums to 1 unless empty."""
+    weights = np.zeros(len(TOPICS), dtype=np.float32)
+    factor = 1.0
+    for text in texts:
+        for i, topic in enumerate(TOPICS):
+            hits = len(_TOPIC_PATTERNS[topic].findall(text))
+            if hits:
+                weights[i] += factor * hits
+        factor *= decay
+    total = weights.sum()
+    return weights / total if total else weights
+
+
+def topic_labels(weights: np.ndarray, threshold: float = 0.1) -> List[str]:
+    order = np.argsort(-weights)
+    return [TOPICS[i] for i in order if weights[i] >= threshold]
+
+
+class PsychologistIndex:
+    def __init__(self, refresh_interval: float = 300.0):
+        self.refresh_interval = refresh_interval
+        self._docs: List[dict] = []
+        self._positions: Dict[str, int] = {}
+        self._topics = np.zeros((0, len(TOPICS)), dtype=np.float32)
+        self._rating = np.zeros(0, dtype=np.float32)
+        self._pricing = np.zeros(0, dtype=np.float32)
+        self._load = np.zeros(0, dtype=np.float32)
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._upserted_during_rebuild: Optional[List[dict]] = None
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    @staticmethod
+    def _specialization_topics(doc: dict) -> np.ndarray:
+        text = " ".join(doc.get("specialization") or []) + " " + doc.get("bio", "")
+        return (topic_vector([text]) > 0).astype(np.float32)
+
+    def replace_all(self, docs: List[dict], load: Dict[str, int]) -> None:
+        self._docs = [{field: doc.get(field) for field in PUBLIC_FIELDS} for doc in docs]
+        self._positions = {doc["psychologist_id"]: i for i, doc in enumerate(self._docs)}
+        self._topics = np.array([self._specialization_topics(doc) for doc in docs], dtype=np.float32).reshape(-1, len(TOPICS))
+        self._rating = np.array([doc.get("rating") or 0.0 for doc in docs], dtype=np.float32)
+        self._pricing = np.array([doc.get("pricing") or 0 for doc in docs], dtype=np.float32)
+        self._load = np.array([load.get(doc["psychologist_id"], 0) for doc in docs], dtype=np.float32)
+        self._loaded_at = time.monotonic()
+
+    def upsert(self, doc: dict) -> None:
+        if self._upserted_during_rebuild is not None:
+            # The rebuild in flight may have read the collection before this approval.
+            self._upserted_during_rebuild.append(doc)
+        public = {field: doc.get(field) for field in PUBLIC_FIELDS}
+        position = self._positions.get(doc["psychologist_id"])
+        if position is None:
+            self._positions[doc["psychologist_id"]] = len(self._docs)
+            self._docs.append(public)
+            self._topics = np.vstack([self._topics, self._specialization_topics(doc)])
+            self._rating = np.append(self._rating, np.float32(doc.get("rating") or 0.0))
+            self._pricing = np.append(self._pricing, np.float32(doc.get("pricing") or 0))
+            self._load = np.append(self._load, np.float32(0))
+        else:
+            self._docs[position] = public
+            self._topics[position] = self._specialization_topics(doc)
+            self._rating[position] = doc.get("rating") or 0.0
+            self._pricing[position] = doc.get("pricing") or 0
+
+    def note_booking(self, psychologist_id: str, delta: int = 1) -> None:
+        position = self._positions.get(psychologist_id)
+        if position is not None:
+            self._load[position] = max(0, self._load[position] + delta)
+
+    def recommend(self, weights: np.ndarray, limit: int = 3, max_price: Optional[int] = None) -> List[dict]:
+        n = len(self._docs)
+        if n == 0 or limit <= 0:
+            return []
+        topic_score = self._topics @ weights
+        rating_score = np.clip(self._rating / 5.0, 0, 1)
+        price_span = float(self._pricing.max() - self._pricing.min())
+        price_score = 1 - (self._pricing - self._pricing.min()) / price_span if price_span else np.ones(n, dtype=np.float32)
+        availability_score = 1 / (1 + self._load)
+        scores = (
+            SCORE_WEIGHTS["topic"] * topic_score
+            + SCORE_WEIGHTS["rating"] * rating_score
+            + SCORE_WEIGHTS["price"] * price_score
+            + SCORE_WEIGHTS["availability"] * availability_score
+        )
+        if max_price is not None:
+            scores = np.where(self._pricing <= max_price, scores, -np.inf)
+        limit = min(limit, n)
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {
+                **self._docs[i],
+                "score": round(float(scores[i]), 4),
+                "matched_topics": [TOPICS[t] for t in np.flatnonzero(self._topics[i] * weights)],
+            }
+            for i in top
+            if np.isfinite(scores[i])
+        ]
+
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_interval
+
+    async def rebuild(self, db) -> None:
+        async with self._lock:
+            self._upserted_during_rebuild = []
+            try:
+                docs = await db.psychologists.find(
+                    {"approved": True}, {"_id": 0, **{field: 1 for field in PUBLIC_FIELDS}}
+                ).to_list(None)
+                today = datetime.now(timezone.utc).date().isoformat()
+                load_rows = await db.bookings.aggregate([
+                    {"$match": {"status": "confirmed", "slot_date": {"$gte": today}}},
+                    {"$group": {"_id": "$psychologist_id", "count": {"$sum": 1}}},
+                ]).to_list(None)
+                upserted, self._upserted_during_rebuild = self._upserted_during_rebuild, None
+                self.replace_all(docs, {row["_id"]: row["count"] for row in load_rows})
+                for doc in upserted:
+                    self.upsert(doc)
+            finally:
+                self._upserted_during_rebuild = None
+
+    async def _rebuild_logged(self, db) -> None:
+        try:
+            await self.rebuild(db)
+        except Exception as e:
+            logger.error(f"Failed to rebuild psychologist index: {str(e)}")
+
+    def refresh_in_background(self, db) -> None:
+        if self.is_stale() and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.create_task(self._rebuild_logged(db))
@@ -1,40 +1,96 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, Cookie
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, Cookie, WebSocket
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from contextlib import asynccontextmanager
+import httpx
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr, ConfigDict
 from typing import List, Optional
 import uuid
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
+from urllib.parse import urlsplit
 import asyncio
-import random
-import resend
-import razorpay
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+import time
+import orjson
+import integrations
+from session_tokens import (
+    SESSION_MODE_OPAQUE, SESSION_MODE_SIGNED, InvalidSessionToken, RevocationList, SessionTokenCodec
+)
+from shared_state import SHARED_STATE_MONGO, SharedState, create_shared_state
+from story_index import StoryIndex
+from recommendations import PsychologistIndex, topic_labels, topic_vector
+from single_flight import SingleFlight
+from crisis import CrisisEscalator
+from chat_ws import ChatConnection
+from analytics import Analytics
+from otp import OTPError, OTPStore
+from language import (
+    LanguageLayer, LlmTranslationBackend, LocalTranslationBackend, crisis_matches, detect_language
+)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '50'))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '5'))
+HTTP_MAX_CONNECTIONS = int(os.environ.get('HTTP_MAX_CONNECTIONS', '50'))
+SHARED_STATE_BACKEND = os.environ.get('SHARED_STATE_BACKEND', SHARED_STATE_MONGO)
+OTP_SEND_LIMIT_PER_HOUR = int(os.environ.get('OTP_SEND_LIMIT_PER_HOUR', '5'))
+PREWARM_INTEGRATIONS = os.environ.get('PREWARM_INTEGRATIONS', 'true').lower() == 'true'
+STORY_SUGGESTIONS_K = int(os.environ.get('STORY_SUGGESTIONS_K', '3'))
+STORY_INDEX_REFRESH_SECONDS = float(os.environ.get('STORY_INDEX_REFRESH_SECONDS', '300'))
+PSYCHOLOGIST_INDEX_REFRESH_SECONDS = float(os.environ.get('PSYCHOLOGIST_INDEX_REFRESH_SECONDS', '300'))
+RECOMMENDATION_MESSAGE_WINDOW = int(os.environ.get('RECOMMENDATION_MESSAGE_WINDOW', '20'))
+CRISIS_NOTIFY_DEDUPE_SECONDS = float(os.environ.get('CRISIS_NOTIFY_DEDUPE_SECONDS', '3600'))
+ADMIN_DASHBOARD_URL = os.environ.get('ADMIN_DASHBOARD_URL', '')
+WS_MAX_INFLIGHT_TURNS = int(os.environ.get('WS_MAX_INFLIGHT_TURNS', '4'))
+WS_HEARTBEAT_SECONDS = float(os.environ.get('WS_HEARTBEAT_SECONDS', '20'))
+WS_IDLE_TIMEOUT_SECONDS = float(os.environ.get('WS_IDLE_TIMEOUT_SECONDS', '60'))
+SESSION_REVALIDATE_SECONDS = float(os.environ.get('SESSION_REVALIDATE_SECONDS', '300'))
+OTP_MAX_ATTEMPTS = int(os.environ.get('OTP_MAX_ATTEMPTS', '5'))
+OTP_LOCKOUT_MINUTES = int(os.environ.get('OTP_LOCKOUT_MINUTES', '15'))
+OTP_SECRET = os.environ.get('OTP_SECRET')
+TRANSLATION_BACKEND = os.environ.get('TRANSLATION_BACKEND', 'llm')
+TRANSLATION_CACHE_SIZE = int(os.environ.get('TRANSLATION_CACHE_SIZE', '2048'))
+CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')
+
+# Per-worker resources, created in the app lifespan.
+client: Optional[AsyncIOMotorClient] = None
+db = None
+http_client: Optional[httpx.AsyncClient] = None
+shared_state: Optional[SharedState] = None
+otp_store: Optional[OTPStore] = None
 
 EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY')
-RESEND_API_KEY = os.environ.get('RESEND_API_KEY')
 SENDER_EMAIL = os.environ.get('SENDER_EMAIL', 'onboarding@resend.dev')
 RAZORPAY_KEY_ID = os.environ.get('RAZORPAY_KEY_ID')
-RAZORPAY_KEY_SECRET = os.environ.get('RAZORPAY_KEY_SECRET')
-JWT_SECRET = os.environ.get('JWT_SECRET', 'saathi_secret')
+JWT_SECRET = os.environ.get('JWT_SECRET')
 OAUTH_BACKEND_URL = os.environ.get('OAUTH_BACKEND_URL', 'https://demobackend.emergentagent.com')
+SESSION_TOKEN_MODE = os.environ.get('SESSION_TOKEN_MODE', SESSION_MODE_OPAQUE)
+REVOCATION_REFRESH_SECONDS = float(os.environ.get('REVOCATION_REFRESH_SECONDS', '30'))
+SESSION_TTL = timedelta(days=7)
 
-resend.api_key = RESEND_API_KEY
-razorpay_client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
+if SESSION_TOKEN_MODE not in (SESSION_MODE_OPAQUE, SESSION_MODE_SIGNED):
+    raise RuntimeError(f"Unknown SESSION_TOKEN_MODE: {SESSION_TOKEN_MODE}")
+# Signed tokens are only minted or accepted in signed mode, and only with a real secret.
+session_codec = SessionTokenCodec(JWT_SECRET, ttl=SESSION_TTL) if SESSION_TOKEN_MODE == SESSION_MODE_SIGNED else None
+revocation_list = RevocationList(refresh_interval=REVOCATION_REFRESH_SECONDS)
+story_index = StoryIndex(refresh_interval=STORY_INDEX_REFRESH_SECONDS)
+psychologist_index = PsychologistIndex(refresh_interval=PSYCHOLOGIST_INDEX_REFRESH_SECONDS)
+single_flight = SingleFlight()
+crisis_escalator = CrisisEscalator(dedupe_window=CRISIS_NOTIFY_DEDUPE_SECONDS)
+analytics = Analytics()
+language_layer = LanguageLayer(
+    LlmTranslationBackend(EMERGENT_LLM_KEY, lambda: integrations.load(integrations.get_llm_chat))
+    if TRANSLATION_BACKEND == 'llm' else LocalTranslationBackend(),
+    cache_size=TRANSLATION_CACHE_SIZE
+)
 
-app = FastAPI()
 api_router = APIRouter(prefix="/api")
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -46,6 +102,21 @@ INDIA_HELPLINES = {
     "Kiran Mental Health": "1800-599-0019",
     "Vandrevala Foundation": "+91-9999666555"
 }
+HELPLINE_MESSAGE = "You are not alone. Please reach out to one of these helplines right now - they are free, confidential and available to help you."
+
+SYSTEM_PROMPT = """You are a compassionate, empathetic relationship support agent for Saathi platform. 
+You help users in India dealing with relationship issues like breakups, marriage conflicts, family pressure, compatibility concerns.
+
+Guidelines:
+- Always validate emotions first
+- Ask clarifying questions
+- Be culturally sensitive to Indian family dynamics and arranged marriages
+- Provide structured guidance: feelings, causes, next steps, warning signs, when to seek professional help
+- Never provide medical diagnoses or legal advice
+- Gently encourage professional therapy when needed
+- Use warm, non-judgmental language
+
+If the user expresses suicidal thoughts or self-harm intent, acknowledge their pain and strongly encourage immediate professional help."""
 
 class User(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -82,6 +153,7 @@ class ChatMessage(BaseModel):
     role: str
     content: str
     is_crisis: bool = False
+    language: Optional[str] = None
     timestamp: datetime
 
 class ChatRequest(BaseModel):
@@ -142,16 +214,61 @@ class SuccessStoryCreate(BaseModel):
     category: str
     content: str
 
-async def get_authenticator(request: Request):
+def model_projection(model) -> dict:
+    return {"_id": 0, **{field: 1 for field in model.model_fields}}
+
+# Projections for documents this service writes itself; responses built from them
+# are serialised directly instead of being re-validated through the response model.
+CHAT_MESSAGE_PROJECTION = model_projection(ChatMessage)
+PSYCHOLOGIST_PROJECTION = model_projection(Psychologist)
+BOOKING_PROJECTION = model_projection(Booking)
+SUCCESS_STORY_PROJECTION = model_projection(SuccessStory)
+
+def trusted_response(content) -> ORJSONResponse:
+    return ORJSONResponse(content)
+
+def get_session_token(request: Request) -> Optional[str]:
     session_token = request.cookies.get("session_token")
     if not session_token:
         auth_header = request.headers.get("Authorization")
         if auth_header and auth_header.startswith("Bearer "):
             session_token = auth_header.split(" ")[1]
+    return session_token
+
+async def issue_session(user_doc: dict, response: Response, session_token: Optional[str] = None) -> str:
+    if SESSION_TOKEN_MODE == SESSION_MODE_SIGNED:
+        session_token = session_codec.issue(user_doc)
+    else:
+        session_token = session_token or f"session_{uuid.uuid4().hex}"
+        session_data = {
+            "user_id": user_doc["user_id"],
+            "session_token": session_token,
+            "expires_at": (datetime.now(timezone.utc) + SESSION_TTL).isoformat(),
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }
+        await db.user_sessions.insert_one(session_data)
     
-    if not session_token:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
+    response.set_cookie(
+        key="session_token",
+        value=session_token,
+        httponly=True,
+        secure=True,
+        samesite="none",
+        path="/",
+        max_age=int(SESSION_TTL.total_seconds())
+    )
+    return session_token
+
+async def authenticate_signed_token(session_token: str) -> User:
+    try:
+        claims = session_codec.decode(session_token)
+    except InvalidSessionToken as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    if await revocation_list.is_revoked(db, claims):
+        raise HTTPException(status_code=401, detail="Invalid session")
+    return User(**session_codec.user_fields(claims))
+
+async def load_session_user(session_token: str) -> dict:
     session_doc = await db.user_sessions.find_one({"session_token": session_token}, {"_id": 0})
     if not session_doc:
         raise HTTPException(status_code=401, detail="Invalid session")
@@ -168,25 +285,60 @@ async def get_authenticator(request: Request):
     if not user_doc:
         raise HTTPException(status_code=404, detail="User not found")
     
+    return user_doc
+
+async def authenticate_session_token(session_token: Optional[str]) -> User:
+    if not session_token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    if session_codec and session_codec.is_signed(session_token):
+        return await authenticate_signed_token(session_token)
+    
+    user_doc = await single_flight.do("auth", session_token, lambda: load_session_user(session_token))
     return User(**user_doc)
 
+async def get_authenticator(request: Request):
+    return await authenticate_session_token(get_session_token(request))
+
+async def session_still_valid(session_token: Optional[str], require_admin: bool = False) -> bool:
+    # Long-lived streams authenticate once at connect; this re-checks expiry, revocation and role.
+    try:
+        user = await authenticate_session_token(session_token)
+    except HTTPException:
+        return False
+    return user.role == "admin" or not require_admin
+
+def get_otp_store() -> OTPStore:
+    # Built on first use so a missing OTP_SECRET disables email sign-in, not the whole app.
+    global otp_store
+    if otp_store is None:
+        try:
+            otp_store = OTPStore(
+                OTP_SECRET,
+                max_attempts=OTP_MAX_ATTEMPTS,
+                lockout=timedelta(minutes=OTP_LOCKOUT_MINUTES)
+            )
+        except ValueError:
+            raise HTTPException(status_code=503, detail="Email sign-in is not available")
+    return otp_store
+
 @api_router.post("/auth/otp/send")
 async def send_otp(req: OTPRequest):
-    otp = str(random.randint(100000, 999999))
-    expires = datetime.now(timezone.utc) + timedelta(minutes=10)
+    store = get_otp_store()
+    if await shared_state.hit_rate_limit(f"otp_send:{req.email}", OTP_SEND_LIMIT_PER_HOUR, 3600):
+        raise HTTPException(status_code=429, detail="Too many OTP requests, please try again later")
     
-    await db.otp_codes.update_one(
-        {"email": req.email},
-        {"$set": {"otp": otp, "expires_at": expires.isoformat()}},
-        upsert=True
-    )
+    try:
+        otp = await store.issue(db, req.email)
+    except OTPError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     
     html_content = f"""
     <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
         <h2 style="color: #4A8B71;">Welcome to Saathi</h2>
         <p>Your OTP code is:</p>
         <h1 style="color: #4A8B71; font-size: 32px; letter-spacing: 4px;">{otp}</h1>
-        <p>This code will expire in 10 minutes.</p>
+        <p>This code will expire in {int(store.ttl.total_seconds() // 60)} minutes.</p>
         <p style="color: #8C9E96;">If you didn't request this, please ignore this email.</p>
     </div>
     """
@@ -198,6 +350,7 @@ async def send_otp(req: OTPRequest):
             "subject": "Your Saathi OTP Code",
             "html": html_content
         }
+        resend = await integrations.load(integrations.get_resend)
         await asyncio.to_thread(resend.Emails.send, params)
         return {"status": "success", "message": "OTP sent to email"}
     except Exception as e:
@@ -206,23 +359,16 @@ async def send_otp(req: OTPRequest):
 
 @api_router.post("/auth/otp/verify")
 async def verify_otp(req: OTPVerify, response: Response):
-    otp_doc = await db.otp_codes.find_one({"email": req.email}, {"_id": 0})
-    if not otp_doc:
-        raise HTTPException(status_code=400, detail="OTP not found")
-    
-    if otp_doc["otp"] != req.otp:
-        raise HTTPException(status_code=400, detail="Invalid OTP")
-    
-    expires_at = datetime.fromisoformat(otp_doc["expires_at"])
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
-    if expires_at < datetime.now(timezone.utc):
-        raise HTTPException(status_code=400, detail="OTP expired")
+    store = get_otp_store()
+    try:
+        await store.verify(db, req.email, req.otp)
+    except OTPError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     
-    user_doc = await db.users.find_one({"email": req.email}, {"_id": 0})
-    if not user_doc:
-        user_id = f"user_{uuid.uuid4().hex[:12]}"
-        user_data = {
+    user_id = f"user_{uuid.uuid4().hex[:12]}"
+    user_doc = await db.users.find_one_and_update(
+        {"email": req.email},
+        {"$setOnInsert": {
             "user_id": user_id,
             "email": req.email,
             "name": req.email.split("@")[0],
@@ -230,30 +376,15 @@ async def verify_otp(req: OTPVerify, response: Response):
             "role": "user",
             "is_anonymous": False,
             "created_at": datetime.now(timezone.utc).isoformat()
-        }
-        await db.users.insert_one(user_data.copy())
-        user_doc = user_data
-    
-    session_token = f"session_{uuid.uuid4().hex}"
-    session_data = {
-        "user_id": user_doc["user_id"],
-        "session_token": session_token,
-        "expires_at": (datetime.now(timezone.utc) + timedelta(days=7)).isoformat(),
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.user_sessions.insert_one(session_data)
-    
-    response.set_cookie(
-        key="session_token",
-        value=session_token,
-        httponly=True,
-        secure=True,
-        samesite="none",
-        path="/",
-        max_age=7*24*60*60
+        }},
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
     )
+    if user_doc["user_id"] == user_id:
+        analytics.record({"signups": 1})
     
-    await db.otp_codes.delete_one({"email": req.email})
+    session_token = await issue_session(user_doc, response)
     
     return {"status": "success", "user": user_doc, "session_token": session_token}
 
@@ -270,25 +401,9 @@ async def anonymous_login(req: AnonymousLogin, response: Response):
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     await db.users.insert_one(user_data.copy())
+    analytics.record({"signups": 1, "anonymous_signups": 1})
     
-    session_token = f"session_{uuid.uuid4().hex}"
-    session_data = {
-        "user_id": user_id,
-        "session_token": session_token,
-        "expires_at": (datetime.now(timezone.utc) + timedelta(days=7)).isoformat(),
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.user_sessions.insert_one(session_data)
-    
-    response.set_cookie(
-        key="session_token",
-        value=session_token,
-        httponly=True,
-        secure=True,
-        samesite="none",
-        path="/",
-        max_age=7*24*60*60
-    )
+    session_token = await issue_session(user_data, response)
     
     return {"status": "success", "user": user_data, "session_token": session_token}
 
@@ -298,8 +413,7 @@ async def google_auth_session(request: Request, response: Response):
     if not session_id:
         raise HTTPException(status_code=400, detail="Session ID required")
     
-    import requests
-    resp = requests.get(
+    resp = await http_client.get(
         f"{OAUTH_BACKEND_URL}/auth/v1/env/oauth/session-data",
         headers={"X-Session-ID": session_id}
     )
@@ -321,26 +435,10 @@ async def google_auth_session(request: Request, response: Response):
             "created_at": datetime.now(timezone.utc).isoformat()
         }
         await db.users.insert_one(user_data.copy())
+        analytics.record({"signups": 1})
         user_doc = user_data
     
-    session_token = data["session_token"]
-    session_data = {
-        "user_id": user_doc["user_id"],
-        "session_token": session_token,
-        "expires_at": (datetime.now(timezone.utc) + timedelta(days=7)).isoformat(),
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.user_sessions.insert_one(session_data)
-    
-    response.set_cookie(
-        key="session_token",
-        value=session_token,
-        httponly=True,
-        secure=True,
-        samesite="none",
-        path="/",
-        max_age=7*24*60*60
-    )
+    session_token = await issue_session(user_doc, response, session_token=data["session_token"])
     
     return {"status": "success", "user": user_doc, "session_token": session_token}
 
@@ -351,80 +449,165 @@ async def get_current_user(request: Request):
 
 @api_router.post("/auth/logout")
 async def logout(request: Request, response: Response):
-    session_token = request.cookies.get("session_token")
-    if session_token:
+    session_token = get_session_token(request)
+    if session_token and session_codec and session_codec.is_signed(session_token):
+        try:
+            await revocation_list.revoke(db, session_codec.decode(session_token))
+        except InvalidSessionToken:
+            pass
+    elif session_token:
         await db.user_sessions.delete_one({"session_token": session_token})
     response.delete_cookie("session_token", path="/")
     return {"status": "success"}
 
-@api_router.post("/chat")
-async def chat_with_ai(req: ChatRequest, request: Request):
-    user = await get_authenticator(request)
-    
-    is_crisis = any(keyword in req.message.lower() for keyword in CRISIS_KEYWORDS)
-    
-    system_prompt = """You are a compassionate, empathetic relationship support agent for Saathi platform. 
-You help users in India dealing with relationship issues like breakups, marriage conflicts, family pressure, compatibility concerns.
-
-Guidelines:
-- Always validate emotions first
-- Ask clarifying questions
-- Be culturally sensitive to Indian family dynamics and arranged marriages
-- Provide structured guidance: feelings, causes, next steps, warning signs, when to seek professional help
-- Never provide medical diagnoses or legal advice
-- Gently encourage professional therapy when needed
-- Use warm, non-judgmental language
-
-If the user expresses suicidal thoughts or self-harm intent, acknowledge their pain and strongly encourage immediate professional help."""
-    
-    chat = LlmChat(
-        api_key=EMERGENT_LLM_KEY,
-        session_id=req.session_id,
-        system_message=system_prompt
-    ).with_model("openai", "gpt-5.2")
+async def run_chat_turn(user: User, session_id: str, message: str) -> dict:
+    language = detect_language(message)
+    crisis_keywords = crisis_matches(message, language, CRISIS_KEYWORDS)
+    is_crisis = bool(crisis_keywords)
+    user_msg_id = f"msg_{uuid.uuid4().hex[:12]}"
+    if is_crisis:
+        # Escalate before the model call, so a slow or failing model never delays or drops it.
+        crisis_escalator.publish(session_id, user.user_id, user_msg_id, message, crisis_keywords)
+    story_index.refresh_in_background(db)
+    suggested_stories = story_index.search(message, k=STORY_SUGGESTIONS_K)
     
-    user_message = UserMessage(text=req.message)
-    ai_response = await chat.send_message(user_message)
+    async def ask_model() -> str:
+        LlmChat, UserMessage = await integrations.load(integrations.get_llm_chat)
+        chat = LlmChat(
+            api_key=EMERGENT_LLM_KEY,
+            session_id=session_id,
+            system_message=language_layer.system_prompt(SYSTEM_PROMPT, language)
+        ).with_model("openai", "gpt-5.2")
+        return await chat.send_message(UserMessage(text=message))
     
-    user_msg_id = f"msg_{uuid.uuid4().hex[:12]}"
-    ai_msg_id = f"msg_{uuid.uuid4().hex[:12]}"
+    # Static content is localised while the model is answering, so cache misses add no extra wait.
+    ai_response, helpline_message, *story_contents = await asyncio.gather(
+        ask_model(),
+        language_layer.localize(HELPLINE_MESSAGE, language) if is_crisis else asyncio.sleep(0),
+        *(language_layer.localize(story["content"], language) for story in suggested_stories),
+        return_exceptions=True
+    )
+    suggested_stories = [
+        {**story, "content": content} for story, content in zip(suggested_stories, story_contents)
+    ]
     
     user_msg_data = {
         "message_id": user_msg_id,
-        "session_id": req.session_id,
+        "session_id": session_id,
         "user_id": user.user_id,
         "role": "user",
-        "content": req.message,
+        "content": message,
         "is_crisis": is_crisis,
+        "language": language,
         "timestamp": datetime.now(timezone.utc).isoformat()
     }
+    analytics.record({"chat_messages": 1, "crisis_messages": int(is_crisis)})
+    analytics.record_active_user(user.user_id)
+    
+    if isinstance(ai_response, Exception):
+        logger.error(f"Chat model call failed: {str(ai_response)}")
+        await db.chat_messages.insert_one(user_msg_data)
+        if not is_crisis:
+            raise HTTPException(status_code=502, detail="Failed to get a response")
+        # A crisis message still gets the helplines when the model is unavailable.
+        raise HTTPException(status_code=502, detail={
+            "message": "Failed to get a response",
+            "is_crisis": True,
+            "helplines": INDIA_HELPLINES,
+            "helpline_message": helpline_message,
+            "language": language
+        })
     
     ai_msg_data = {
-        "message_id": ai_msg_id,
-        "session_id": req.session_id,
+        "message_id": f"msg_{uuid.uuid4().hex[:12]}",
+        "session_id": session_id,
         "user_id": user.user_id,
         "role": "assistant",
         "content": ai_response,
         "is_crisis": False,
+        "language": language,
         "timestamp": datetime.now(timezone.utc).isoformat()
     }
-    
     await db.chat_messages.insert_many([user_msg_data, ai_msg_data])
     
     return {
         "response": ai_response,
         "is_crisis": is_crisis,
-        "helplines": INDIA_HELPLINES if is_crisis else None
+        "helplines": INDIA_HELPLINES if is_crisis else None,
+        "helpline_message": helpline_message if is_crisis else None,
+        "suggested_stories": suggested_stories,
+        "language": language
     }
 
+@api_router.post("/chat")
+async def chat_with_ai(req: ChatRequest, request: Request):
+    user = await get_authenticator(request)
+    return await run_chat_turn(user, req.session_id, req.message)
+
+def websocket_origin_allowed(origin: Optional[str], host: Optional[str]) -> bool:
+    # CORS does not cover WebSockets, and the session cookie is SameSite=None, so a browser would
+    # otherwise let any site open the socket as the signed-in user.
+    if origin is None:
+        return True
+    if origin in CORS_ORIGINS and origin != "*":
+        return True
+    return urlsplit(origin).netloc == host
+
+@api_router.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket):
+    if not websocket_origin_allowed(websocket.headers.get("origin"), websocket.headers.get("host")):
+        # Closing before accept() rejects the handshake with HTTP 403.
+        await websocket.close(code=1008)
+        return
+    
+    # No ?token= fallback: query strings end up in access logs.
+    session_token = websocket.cookies.get("session_token")
+    if not session_token:
+        auth_header = websocket.headers.get("Authorization")
+        if auth_header and auth_header.startswith("Bearer "):
+            session_token = auth_header.split(" ")[1]
+    await websocket.accept()
+    try:
+        user = await authenticate_session_token(session_token)
+    except HTTPException as e:
+        # Accepted first so the client sees the 4401 close code rather than a bare 403.
+        await websocket.close(code=4401, reason=e.detail)
+        return
+    
+    connection = ChatConnection(
+        websocket, user, run_chat_turn,
+        max_inflight=WS_MAX_INFLIGHT_TURNS,
+        heartbeat_interval=WS_HEARTBEAT_SECONDS,
+        idle_timeout=WS_IDLE_TIMEOUT_SECONDS,
+        revalidate=lambda: session_still_valid(session_token),
+        revalidate_interval=SESSION_REVALIDATE_SECONDS
+    )
+    await connection.serve()
+
 @api_router.get("/chat/history/{session_id}")
 async def get_chat_history(session_id: str, request: Request, limit: int = 50):
     user = await get_authenticator(request)
     messages = await db.chat_messages.find(
         {"session_id": session_id, "user_id": user.user_id},
-        {"_id": 0}
+        CHAT_MESSAGE_PROJECTION
     ).sort("timestamp", 1).limit(limit).to_list(limit)
-    return messages
+    return trusted_response(messages)
+
+@api_router.get("/chat/{session_id}/recommendations")
+async def recommend_psychologists(session_id: str, request: Request, limit: int = 3, max_price: Optional[int] = None):
+    user = await get_authenticator(request)
+    psychologist_index.refresh_in_background(db)
+    
+    recent = await db.chat_messages.find(
+        {"session_id": session_id, "user_id": user.user_id, "role": "user"},
+        {"_id": 0, "content": 1}
+    ).sort("timestamp", -1).limit(RECOMMENDATION_MESSAGE_WINDOW).to_list(RECOMMENDATION_MESSAGE_WINDOW)
+    
+    weights = topic_vector(msg["content"] for msg in recent)
+    return {
+        "topics": topic_labels(weights),
+        "recommendations": psychologist_index.recommend(weights, limit=limit, max_price=max_price)
+    }
 
 @api_router.delete("/chat/history/{session_id}")
 async def delete_chat_history(session_id: str, request: Request):
@@ -447,15 +630,21 @@ async def create_psychologist(req: PsychologistCreate):
 @api_router.get("/psychologists", response_model=List[Psychologist])
 async def get_psychologists(approved_only: bool = True, skip: int = 0, limit: int = 20):
     filter_query = {"approved": True} if approved_only else {}
-    psychologists = await db.psychologists.find(filter_query, {"_id": 0}).skip(skip).limit(limit).to_list(limit)
-    return psychologists
+    psychologists = await single_flight.do(
+        "psychologists", (approved_only, skip, limit),
+        lambda: db.psychologists.find(filter_query, PSYCHOLOGIST_PROJECTION).skip(skip).limit(limit).to_list(limit)
+    )
+    return trusted_response(psychologists)
 
 @api_router.get("/psychologists/{psychologist_id}", response_model=Psychologist)
 async def get_psychologist(psychologist_id: str):
-    psychologist = await db.psychologists.find_one({"psychologist_id": psychologist_id}, {"_id": 0})
+    psychologist = await single_flight.do(
+        "psychologist", psychologist_id,
+        lambda: db.psychologists.find_one({"psychologist_id": psychologist_id}, PSYCHOLOGIST_PROJECTION)
+    )
     if not psychologist:
         raise HTTPException(status_code=404, detail="Psychologist not found")
-    return Psychologist(**psychologist)
+    return trusted_response(psychologist)
 
 @api_router.post("/bookings/create-order")
 async def create_booking_order(req: BookingCreate, request: Request):
@@ -467,7 +656,8 @@ async def create_booking_order(req: BookingCreate, request: Request):
     
     amount = psychologist["pricing"] * 100
     
-    razor_order = razorpay_client.order.create({
+    razorpay_client = await integrations.load(integrations.get_razorpay_client)
+    razor_order = await asyncio.to_thread(razorpay_client.order.create, {
         "amount": amount,
         "currency": "INR",
         "payment_capture": 1
@@ -487,6 +677,7 @@ async def create_booking_order(req: BookingCreate, request: Request):
     }
     
     await db.bookings.insert_one(booking_data)
+    analytics.record({"bookings_created": 1})
     
     return {
         "booking_id": booking_id,
@@ -504,10 +695,22 @@ async def confirm_booking(booking_id: str, payment_id: str, request: Request):
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
     
-    await db.bookings.update_one(
-        {"booking_id": booking_id},
-        {"$set": {"status": "confirmed", "payment_id": payment_id}}
+    result = await db.bookings.update_one(
+        {"booking_id": booking_id, "status": {"$ne": "confirmed"}},
+        {"$set": {
+            "status": "confirmed",
+            "payment_id": payment_id,
+            "confirmed_at": datetime.now(timezone.utc).isoformat()
+        }}
     )
+    if result.modified_count:
+        psychologist_index.note_booking(booking["psychologist_id"])
+        analytics.record(
+            {"bookings_confirmed": 1, "revenue": booking["amount"]},
+            psychologist_revenue={booking["psychologist_id"]: booking["amount"]}
+        )
+    else:
+        await db.bookings.update_one({"booking_id": booking_id}, {"$set": {"payment_id": payment_id}})
     
     return {"status": "success", "message": "Booking confirmed"}
 
@@ -516,9 +719,20 @@ async def get_user_bookings(request: Request, limit: int = 20):
     user = await get_authenticator(request)
     bookings = await db.bookings.find(
         {"user_id": user.user_id}, 
-        {"_id": 0}
+        BOOKING_PROJECTION
     ).sort("created_at", -1).limit(limit).to_list(limit)
-    return bookings
+    return trusted_response(bookings)
+
+@api_router.post("/admin/users/{user_id}/sign-out")
+async def force_sign_out(user_id: str, request: Request):
+    user = await get_authenticator(request)
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    # Signed tokens carry the role for their whole lifetime, so demotions need this to take effect.
+    await revocation_list.revoke_user(db, user_id, SESSION_TTL)
+    result = await db.user_sessions.delete_many({"user_id": user_id})
+    return {"status": "success", "opaque_sessions_deleted": result.deleted_count}
 
 @api_router.get("/admin/psychologists")
 async def admin_get_psychologists(request: Request, skip: int = 0, limit: int = 50):
@@ -526,8 +740,8 @@ async def admin_get_psychologists(request: Request, skip: int = 0, limit: int =
     if user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    psychologists = await db.psychologists.find({}, {"_id": 0}).skip(skip).limit(limit).to_list(limit)
-    return psychologists
+    psychologists = await db.psychologists.find({}, PSYCHOLOGIST_PROJECTION).skip(skip).limit(limit).to_list(limit)
+    return trusted_response(psychologists)
 
 @api_router.post("/admin/psychologists/{psychologist_id}/approve")
 async def approve_psychologist(psychologist_id: str, request: Request):
@@ -535,12 +749,162 @@ async def approve_psychologist(psychologist_id: str, request: Request):
     if user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    await db.psychologists.update_one(
+    psychologist = await db.psychologists.find_one_and_update(
+        {"psychologist_id": psychologist_id},
+        {"$set": {"approved": True}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if psychologist:
+        psychologist_index.upsert(psychologist)
+    return {"status": "success"}
+
+@api_router.post("/admin/psychologists/{psychologist_id}/on-call")
+async def set_psychologist_on_call(psychologist_id: str, on_call: bool, request: Request):
+    user = await get_authenticator(request)
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    result = await db.psychologists.update_one(
         {"psychologist_id": psychologist_id},
-        {"$set": {"approved": True}}
+        {"$set": {"on_call": on_call}}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Psychologist not found")
+    return {"status": "success", "on_call": on_call}
+
+async def notify_on_call_psychologists(event: dict) -> bool:
+    on_call = await db.psychologists.find(
+        {"approved": True, "on_call": True}, {"_id": 0, "email": 1}
+    ).to_list(None)
+    if not on_call:
+        logger.warning(f"No on-call psychologists to alert for crisis event {event['event_id']}")
+        return False
+    
+    html_content = f"""
+    <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+        <h2 style="color: #C0392B;">Saathi crisis alert</h2>
+        <p>A user in chat session <strong>{event['session_id']}</strong> has expressed crisis intent.</p>
+        <p>Event ID: {event['event_id']}<br>Detected at: {event['created_at']}</p>
+        <p>Please review it in the admin dashboard. {ADMIN_DASHBOARD_URL}</p>
+    </div>
+    """
+    resend = await integrations.load(integrations.get_resend)
+    # One email per psychologist so recipients never see each other's addresses.
+    results = await asyncio.gather(*(
+        asyncio.to_thread(resend.Emails.send, {
+            "from": SENDER_EMAIL,
+            "to": [psychologist["email"]],
+            "subject": "Saathi crisis alert - immediate attention needed",
+            "html": html_content
+        })
+        for psychologist in on_call
+    ), return_exceptions=True)
+    failures = [result for result in results if isinstance(result, Exception)]
+    if len(failures) == len(results):
+        raise failures[0]
+    if failures:
+        logger.error(f"Crisis alert for {event['event_id']} failed for {len(failures)} of {len(results)} psychologists: {str(failures[0])}")
+    return True
+
+@api_router.get("/admin/crisis/events")
+async def get_crisis_events(request: Request, status: Optional[str] = None, limit: int = 50):
+    user = await get_authenticator(request)
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    filter_query = {"status": status} if status else {}
+    events = await db.crisis_events.find(filter_query, {"_id": 0}).sort("created_at", -1).limit(limit).to_list(limit)
+    return trusted_response(events)
+
+@api_router.post("/admin/crisis/events/{event_id}/acknowledge")
+async def acknowledge_crisis_event(event_id: str, request: Request):
+    user = await get_authenticator(request)
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    result = await db.crisis_events.update_one(
+        {"event_id": event_id},
+        {"$set": {
+            "status": "acknowledged",
+            "acknowledged_by": user.user_id,
+            "acknowledged_at": datetime.now(timezone.utc).isoformat()
+        }}
     )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Crisis event not found")
     return {"status": "success"}
 
+@api_router.get("/admin/crisis/feed")
+async def crisis_feed(request: Request):
+    user = await get_authenticator(request)
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    session_token = get_session_token(request)
+    
+    async def event_stream():
+        last_validated = time.monotonic()
+        async for event in crisis_escalator.feed():
+            if time.monotonic() - last_validated >= SESSION_REVALIDATE_SECONDS:
+                # Ends the stream for a signed-out or demoted admin.
+                if not await session_still_valid(session_token, require_admin=True):
+                    return
+                last_validated = time.monotonic()
+            if event is None:
+                yield b": keep-alive\n\n"
+            else:
+                yield b"event: crisis\nid: " + event["event_id"].encode() + b"\ndata: " + orjson.dumps(event) + b"\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def analytics_range(start: Optional[date], end: Optional[date], default_days: int = 30):
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=default_days - 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (end - start).days > 366:
+        raise HTTPException(status_code=400, detail="Range is limited to 366 days")
+    return start, end
+
+@api_router.get("/admin/analytics/daily")
+async def get_daily_analytics(request: Request, start: Optional[date] = None, end: Optional[date] = None):
+    user = await get_authenticator(request)
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    start, end = analytics_range(start, end)
+    return trusted_response(await analytics.daily(start, end))
+
+@api_router.get("/admin/analytics/hourly")
+async def get_hourly_analytics(request: Request, day: Optional[date] = None):
+    user = await get_authenticator(request)
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return trusted_response(await analytics.hourly(day or datetime.now(timezone.utc).date()))
+
+@api_router.get("/admin/analytics/summary")
+async def get_analytics_summary(request: Request, start: Optional[date] = None, end: Optional[date] = None):
+    user = await get_authenticator(request)
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    start, end = analytics_range(start, end)
+    return await analytics.summary(start, end)
+
+@api_router.post("/admin/analytics/rebuild")
+async def rebuild_analytics(request: Request, day: date):
+    user = await get_authenticator(request)
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return await analytics.rebuild_day(day)
+
 @api_router.post("/stories", response_model=SuccessStory)
 async def create_success_story(req: SuccessStoryCreate, request: Request):
     user = await get_authenticator(request)
@@ -556,11 +920,14 @@ async def create_success_story(req: SuccessStoryCreate, request: Request):
 
 @api_router.get("/stories", response_model=List[SuccessStory])
 async def get_success_stories(skip: int = 0, limit: int = 20):
-    stories = await db.success_stories.find(
-        {"approved": True}, 
-        {"_id": 0}
-    ).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
-    return stories
+    stories = await single_flight.do(
+        "stories", (skip, limit),
+        lambda: db.success_stories.find(
+            {"approved": True}, 
+            SUCCESS_STORY_PROJECTION
+        ).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    )
+    return trusted_response(stories)
 
 @api_router.post("/admin/stories/{story_id}/approve")
 async def approve_story(story_id: str, request: Request):
@@ -568,26 +935,99 @@ async def approve_story(story_id: str, request: Request):
     if user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    await db.success_stories.update_one(
+    story = await db.success_stories.find_one_and_update(
         {"story_id": story_id},
-        {"$set": {"approved": True}}
+        {"$set": {"approved": True}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
+    if story:
+        story_index.add(story)
     return {"status": "success"}
 
+@api_router.get("/admin/metrics/single-flight")
+async def single_flight_metrics(request: Request):
+    user = await get_authenticator(request)
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return single_flight.stats()
+
+@api_router.get("/admin/metrics/translations")
+async def translation_metrics(request: Request):
+    user = await get_authenticator(request)
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return language_layer.stats()
+
 @api_router.get("/")
 async def root():
     return {"message": "Saathi API - Confidential Relationship Support Platform"}
 
-app.include_router(api_router)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client, db, http_client, shared_state
+    try:
+        get_otp_store()
+    except HTTPException:
+        logger.warning("OTP_SECRET is missing or shorter than 32 bytes; /auth/otp/* will return 503")
+    client = AsyncIOMotorClient(
+        os.environ['MONGO_URL'],
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=60_000,
+    )
+    db = client[os.environ['DB_NAME']]
+    http_client = httpx.AsyncClient(
+        timeout=httpx.Timeout(10.0),
+        limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_CONNECTIONS),
+    )
+    shared_state = create_shared_state(SHARED_STATE_BACKEND, db)
+    
+    await shared_state.setup()
+    await RevocationList.ensure_indexes(db)
+    await OTPStore.ensure_indexes(db)
+    await db.users.create_index("email")
+    await db.chat_messages.create_index([("session_id", 1), ("user_id", 1), ("timestamp", -1)])
+    await CrisisEscalator.ensure_indexes(db)
+    crisis_escalator.start(db, shared_state, notifier=notify_on_call_psychologists)
+    await Analytics.ensure_indexes(db)
+    await Analytics.backfill_confirmed_at(db)
+    analytics.start(db, shared_state)
+    story_index.refresh_in_background(db)
+    psychologist_index.refresh_in_background(db)
+    if PREWARM_INTEGRATIONS:
+        # Readiness does not wait on the SDK imports; requests that need one await it via integrations.load.
+        integrations.start_prewarm()
+    try:
+        yield
+    finally:
+        await crisis_escalator.stop()
+        await analytics.stop()
+        await http_client.aclose()
+        client.close()
+
+def create_app() -> FastAPI:
+    app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+    app.include_router(api_router)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=CORS_ORIGINS,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    return app
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+app = create_app()
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+if __name__ == "__main__":
+    import uvicorn
+    # Each worker process builds its own app, Mongo pool and HTTP client through the lifespan,
+    # so scale out deliberately with WEB_CONCURRENCY rather than one worker per core.
+    uvicorn.run(
+        "server:create_app",
+        factory=True,
+        host=os.environ.get('HOST', '0.0.0.0'),
+        port=int(os.environ.get('PORT', '8001')),
+        workers=int(os.environ.get('WEB_CONCURRENCY', '1')),
+    )
@@ -0,0 +1,155 @@
+"""Signed, stateless session tokens plus a cached revocation denylist.
+
+Signed tokens are HS256 JWTs that carry everything `get_authenticator` needs
+to build a `User`, so verifying one costs no database round trip. Logout
+adds the token's `jti` to the `revoked_tokens` collection. A forced sign-out
+(after a role change, say) records a `revoked_before` time for the user in
+`revoked_users`, which rejects every token for that user issued earlier.
+Each worker keeps an in-memory copy of both denylists and refreshes it every
+few seconds.
+"""
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Optional
+
+import jwt
+
+SESSION_MODE_OPAQUE = "opaque"
+SESSION_MODE_SIGNED = "signed"
+
+SIGNED_TOKEN_PREFIX = "st."
+JWT_ALGORITHM = "HS256"
+MIN_SECRET_BYTES = 32
+
+
+class InvalidSessionToken(Exception):
+    pass
+
+
+class SessionTokenCodec:
+    def __init__(self, secret: Optional[str], ttl: timedelta = timedelta(days=7)):
+        if not secret or len(secret.encode()) < MIN_SECRET_BYTES:
+            raise ValueError(f"Signed session tokens need a JWT_SECRET of at least {MIN_SECRET_BYTES} bytes")
+        self.secret = secret
+        self.ttl = ttl
+
+    @staticmethod
+    def is_signed(token: str) -> bool:
+        return token.startswith(SIGNED_TOKEN_PREFIX)
+
+    def issue(self, user_doc: dict) -> str:
+        now = datetime.now(timezone.utc)
+        created_at = user_doc.get("created_at")
+        if isinstance(created_at, datetime):
+            created_at = created_at.isoformat()
+        claims = {
+            "sub": user_doc["user_id"],
+            "role": user_doc.get("role", "user"),
+            "email": user_doc["email"],
+            "name": user_doc["name"],
+            "picture": user_doc.get("picture"),
+            "anon": user_doc.get("is_anonymous", False),
+            "created": created_at,
+            "jti": uuid.uuid4().hex,
+            "iat": int(now.timestamp()),
+            "exp": int((now + self.ttl).timestamp()),
+        }
+        return SIGNED_TOKEN_PREFIX + jwt.encode(claims, self.secret, algorithm=JWT_ALGORITHM)
+
+    def decode(self, token: str) -> dict:
+        if not self.is_signed(token):
+            raise InvalidSessionToken("Not a signed session token")
+        try:
+            return jwt.decode(
+                token[len(SIGNED_TOKEN_PREFIX):],
+                self.secret,
+                algorithms=[JWT_ALGORITHM],
+                options={"require": ["sub", "exp", "iat", "jti"]},
+            )
+        except jwt.ExpiredSignatureError as e:
+            raise InvalidSessionToken("Session expired") from e
+        except jwt.InvalidTokenError as e:
+            raise InvalidSessionToken("Invalid session") from e
+
+    @staticmethod
+    def user_fields(claims: dict) -> dict:
+        return {
+            "user_id": claims["sub"],
+            "email": claims["email"],
+            "name": claims["name"],
+            "picture": claims.get("picture"),
+            "role": claims.get("role", "user"),
+            "is_anonymous": claims.get("anon", False),
+            "created_at": claims["created"],
+        }
+
+
+class RevocationList:
+    """Per-worker cache of revoked token ids and per-user cut-offs."""
+
+    def __init__(self, refresh_interval: float = 30.0):
+        self.refresh_interval = refresh_interval
+        self._revoked: set = set()
+        self._revoked_before: Dict[str, float] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_interval
+
+    async def refresh(self, db) -> None:
+        async with self._lock:
+            if not self.is_stale():
+                return
+            now = datetime.now(timezone.utc)
+            docs = await db.revoked_tokens.find(
+                {"expires_at": {"$gt": now}}, {"_id": 0, "jti": 1}
+            ).to_list(None)
+            users = await db.revoked_users.find(
+                {"expires_at": {"$gt": now}}, {"_id": 0, "user_id": 1, "revoked_before": 1}
+            ).to_list(None)
+            self._revoked = {doc["jti"] for doc in docs}
+            self._revoked_before = {doc["user_id"]: _timestamp(doc["revoked_before"]) for doc in users}
+            self._loaded_at = time.monotonic()
+
+    async def is_revoked(self, db, claims: dict) -> bool:
+        if self.is_stale():
+            await self.refresh(db)
+        if claims["jti"] in self._revoked:
+            return True
+        revoked_before = self._revoked_before.get(claims["sub"])
+        # iat has one-second resolution, so a token issued in the same second is treated as revoked.
+        return revoked_before is not None and claims["iat"] <= revoked_before
+
+    async def revoke(self, db, claims: dict) -> None:
+        expires_at = datetime.fromtimestamp(claims["exp"], tz=timezone.utc)
+        await db.revoked_tokens.update_one(
+            {"jti": claims["jti"]},
+            {"$set": {"jti": claims["jti"], "user_id": claims["sub"], "expires_at": expires_at}},
+            upsert=True,
+        )
+        self._revoked.add(claims["jti"])
+
+    async def revoke_user(self, db, user_id: str, ttl: timedelta) -> None:
+        """Reject every token already issued to `user_id`; `ttl` is the longest a token can live."""
+        now = datetime.now(timezone.utc)
+        await db.revoked_users.update_one(
+            {"user_id": user_id},
+            {"$set": {"user_id": user_id, "revoked_before": now, "expires_at": now + ttl}},
+            upsert=True,
+        )
+        self._revoked_before[user_id] = now.timestamp()
+
+    @staticmethod
+    async def ensure_indexes(db) -> None:
+        await db.revoked_tokens.create_index("jti", unique=True)
+        await db.revoked_tokens.create_index("expires_at", expireAfterSeconds=0)
+        await db.revoked_users.create_index("user_id", unique=True)
+        await db.revoked_users.create_index("expires_at", expireAfterSeconds=0)
+
+
+def _timestamp(value: datetime) -> float:
+    # Motor returns naive UTC datetimes unless the client is tz_aware.
+    return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
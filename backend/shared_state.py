@@ -0,0 +1,177 @@
+"""Shared state for caches, rate limits and locks.
+
+Anything that must behave the same no matter which worker serves a request
+goes through a `SharedState`. `InMemorySharedState` is for a single worker
+(local development, tests); `MongoSharedState` keeps the entries in the
+`shared_state` collection so every uvicorn/gunicorn worker sees them.
+Values must be BSON-serialisable.
+"""
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone, timedelta
+from typing import Any, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+SHARED_STATE_MEMORY = "memory"
+SHARED_STATE_MONGO = "mongo"
+
+
+class SharedState:
+    async def get(self, key: str) -> Any:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        raise NotImplementedError
+
+    async def add(self, key: str, value: Any, ttl: float) -> bool:
+        """Set `key` only if it is absent or expired; return whether it was set."""
+        raise NotImplementedError
+
+    async def incr(self, key: str, amount: int = 1, ttl: float = 60) -> int:
+        """Increment a counter, starting a new `ttl` window if it has expired."""
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    async def setup(self) -> None:
+        pass
+
+    async def try_lock(self, name: str, ttl: float) -> Optional[str]:
+        owner = uuid.uuid4().hex
+        if await self.add(f"lock:{name}", owner, ttl):
+            return owner
+        return None
+
+    async def unlock(self, name: str, owner: str) -> None:
+        if await self.get(f"lock:{name}") == owner:
+            await self.delete(f"lock:{name}")
+
+    @asynccontextmanager
+    async def lock(self, name: str, ttl: float = 30, timeout: float = 10, poll_interval: float = 0.05):
+        deadline = time.monotonic() + timeout
+        owner = await self.try_lock(name, ttl)
+        while owner is None:
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Could not acquire lock {name!r}")
+            await asyncio.sleep(poll_interval)
+            owner = await self.try_lock(name, ttl)
+        try:
+            yield
+        finally:
+            await self.unlock(name, owner)
+
+    async def hit_rate_limit(self, key: str, limit: int, window: float) -> bool:
+        """Count one hit against `key`; return True once `limit` is exceeded in `window` seconds."""
+        return await self.incr(f"ratelimit:{key}", 1, window) > limit
+
+
+class InMemorySharedState(SharedState):
+    def __init__(self):
+        self._entries: dict = {}
+
+    def _live(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self._entries[key]
+            return None
+        return entry
+
+    async def get(self, key: str) -> Any:
+        entry = self._live(key)
+        return entry[0] if entry else None
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._entries[key] = (value, time.monotonic() + ttl)
+
+    async def add(self, key: str, value: Any, ttl: float) -> bool:
+        if self._live(key):
+            return False
+        self._entries[key] = (value, time.monotonic() + ttl)
+        return True
+
+    async def incr(self, key: str, amount: int = 1, ttl: float = 60) -> int:
+        entry = self._live(key)
+        if entry:
+            value = entry[0] + amount
+            self._entries[key] = (value, entry[1])
+        else:
+            value = amount
+            self._entries[key] = (value, time.monotonic() + ttl)
+        return value
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+
+class MongoSharedState(SharedState):
+    def __init__(self, db, collection: str = "shared_state"):
+        self.collection = db[collection]
+
+    @staticmethod
+    def _expiry(ttl: float) -> datetime:
+        return datetime.now(timezone.utc) + timedelta(seconds=ttl)
+
+    async def setup(self) -> None:
+        # TTL cleanup runs about once a minute, so reads also filter on expires_at.
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def get(self, key: str) -> Any:
+        doc = await self.collection.find_one(
+            {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}}, {"value": 1}
+        )
+        return doc["value"] if doc else None
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        await self.collection.update_one(
+            {"_id": key}, {"$set": {"value": value, "expires_at": self._expiry(ttl)}}, upsert=True
+        )
+
+    async def add(self, key: str, value: Any, ttl: float) -> bool:
+        try:
+            await self.collection.update_one(
+                {"_id": key, "expires_at": {"$lte": datetime.now(timezone.utc)}},
+                {"$set": {"value": value, "expires_at": self._expiry(ttl)}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def incr(self, key: str, amount: int = 1, ttl: float = 60) -> int:
+        now = datetime.now(timezone.utc)
+        live = {"$gt": ["$expires_at", now]}
+        pipeline = [{"$set": {
+            "value": {"$cond": [live, {"$add": ["$value", amount]}, amount]},
+            "expires_at": {"$cond": [live, "$expires_at", self._expiry(ttl)]},
+        }}]
+        for _ in range(2):
+            try:
+                doc = await self.collection.find_one_and_update(
+                    {"_id": key}, pipeline, upsert=True, return_document=ReturnDocument.AFTER
+                )
+                return doc["value"]
+            except DuplicateKeyError:
+                # Another worker inserted the counter first; the retry increments it.
+                continue
+        raise RuntimeError(f"Could not increment {key!r}")
+
+    async def delete(self, key: str) -> None:
+        await self.collection.delete_one({"_id": key})
+
+    async def unlock(self, name: str, owner: str) -> None:
+        await self.collection.delete_one({"_id": f"lock:{name}", "value": owner})
+
+
+def create_shared_state(kind: str, db) -> SharedState:
+    if kind == SHARED_STATE_MEMORY:
+        return InMemorySharedState()
+    if kind == SHARED_STATE_MONGO:
+        return MongoSharedState(db)
+    raise ValueError(f"Unknown shared state backend: {kind}")
@@ -0,0 +1,47 @@
+"""Request coalescing for identical concurrent reads.
+
+While a call for a given (group, key) is in flight, later callers await the
+same task instead of issuing their own query. Results are shared between
+callers, so they must be treated as read-only.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[Tuple[str, Hashable], asyncio.Task] = {}
+        self._calls: Dict[str, int] = {}
+        self._executions: Dict[str, int] = {}
+
+    async def do(self, group: str, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self._calls[group] = self._calls.get(group, 0) + 1
+        flight_key = (group, key)
+        task = self._inflight.get(flight_key)
+        if task is None:
+            self._executions[group] = self._executions.get(group, 0) + 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[flight_key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(flight_key, None))
+        # Shielded so one caller disconnecting does not cancel the query for the others.
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        groups = {}
+        for group, calls in self._calls.items():
+            executions = self._executions.get(group, 0)
+            groups[group] = {
+                "calls": calls,
+                "executions": executions,
+                "coalesced": calls - executions,
+                "coalescing_ratio": round((calls - executions) / calls, 4) if calls else 0.0,
+            }
+        total_calls = sum(self._calls.values())
+        total_executions = sum(self._executions.values())
+        return {
+            "in_flight": len(self._inflight),
+            "calls": total_calls,
+            "executions": total_executions,
+            "coalescing_ratio": round((total_calls - total_executions) / total_calls, 4) if total_calls else 0.0,
+            "groups": groups,
+        }
@@ -0,0 +1,156 @@
+"""In-memory TF-IDF index over approved success stories.
+
+Terms are hashed into a fixed number of buckets so stories can be appended
+without re-tokenising the corpus; only the IDF weighting is recomputed, as
+a single vectorised pass over the count matrix. A query is one
+matrix-vector product followed by a partial sort.
+"""
+import asyncio
+import logging
+import re
+import time
+import zlib
+from collections import Counter
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset("""
+a an and are as at be but by for from had has have he her his i in is it its me my of on or our she so
+that the their them they this to was we were what when with you your am been do did not no just very
+""".split())
+
+
+SUFFIXES = ("ing", "ed", "ly", "es", "s")
+
+
+def stem(token: str) -> str:
+    for suffix in SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [stem(t) for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+class StoryIndex:
+    def __init__(self, dim: int = 2048, refresh_interval: float = 300.0):
+        self.dim = dim
+        self.refresh_interval = refresh_interval
+        self._stories: List[dict] = []
+        self._positions: dict = {}
+        self._counts = np.zeros((0, dim), dtype=np.float32)
+        self._df = np.zeros(dim, dtype=np.float32)
+        self._idf = np.ones(dim, dtype=np.float32)
+        self._matrix = np.zeros((0, dim), dtype=np.float32)
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._added_during_rebuild: Optional[List[dict]] = None
+
+    def __len__(self) -> int:
+        return len(self._stories)
+
+    def _term_counts(self, text: str) -> np.ndarray:
+        row = np.zeros(self.dim, dtype=np.float32)
+        for token, count in Counter(tokenize(text)).items():
+            row[zlib.crc32(token.encode()) % self.dim] += count
+        # Sublinear tf so one repeated word does not dominate a story.
+        np.log1p(row, out=row)
+        return row
+
+    @staticmethod
+    def _document(story: dict) -> str:
+        return f"{story.get('category', '')} {story['content']}"
+
+    def _reweight(self) -> None:
+        n = len(self._stories)
+        self._idf = (np.log((1 + n) / (1 + self._df)) + 1).astype(np.float32)
+        weighted = self._counts[:n] * self._idf
+        norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        self._matrix = weighted / norms
+
+    def _append(self, story: dict) -> None:
+        n = len(self._stories)
+        if n == self._counts.shape[0]:
+            grown = np.zeros((max(16, n * 2), self.dim), dtype=np.float32)
+            grown[:n] = self._counts[:n]
+            self._counts = grown
+        row = self._term_counts(self._document(story))
+        self._counts[n] = row
+        self._df += row > 0
+        self._positions[story["story_id"]] = n
+        self._stories.append({
+            "story_id": story["story_id"],
+            "category": story.get("category"),
+            "content": story["content"],
+        })
+
+    def add(self, story: dict) -> None:
+        if self._added_during_rebuild is not None:
+            # The rebuild in flight may have read the collection before this story was approved.
+            self._added_during_rebuild.append(story)
+        if story["story_id"] in self._positions:
+            return
+        self._append(story)
+        self._reweight()
+
+    def replace_all(self, stories: List[dict]) -> None:
+        self._stories = []
+        self._positions = {}
+        self._counts = np.zeros((len(stories), self.dim), dtype=np.float32)
+        self._df = np.zeros(self.dim, dtype=np.float32)
+        for story in stories:
+            if story["story_id"] not in self._positions:
+                self._append(story)
+        self._reweight()
+        self._loaded_at = time.monotonic()
+
+    def search(self, text: str, k: int = 3, min_score: float = 0.1) -> List[dict]:
+        n = len(self._stories)
+        if n == 0 or k <= 0:
+            return []
+        query = self._term_counts(text) * self._idf
+        norm = float(np.linalg.norm(query))
+        if norm == 0:
+            return []
+        scores = self._matrix @ (query / norm)
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {**self._stories[i], "score": round(float(scores[i]), 4)}
+            for i in top
+            if scores[i] >= min_score
+        ]
+
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_interval
+
+    async def rebuild(self, db) -> None:
+        async with self._lock:
+            self._added_during_rebuild = []
+            try:
+                stories = await db.success_stories.find(
+                    {"approved": True}, {"_id": 0, "story_id": 1, "category": 1, "content": 1}
+                ).to_list(None)
+                self.replace_all(stories + self._added_during_rebuild)
+            finally:
+                self._added_during_rebuild = None
+
+    async def _rebuild_logged(self, db) -> None:
+        try:
+            await self.rebuild(db)
+        except Exception as e:
+            logger.error(f"Failed to rebuild story index: {str(e)}")
+
+    def refresh_in_background(self, db) -> None:
+        # Picks up stories approved on other workers without delaying the caller.
+        if self.is_stale() and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.create_task(self._rebuild_logged(db))
@@ -228,6 +228,9 @@ class SaathiAPITester:
         # Test chat history
         self.run_test("Get Chat History", "GET", f"chat/history/{chat_session_id}", 200)
         
+        # Test psychologist recommendations for the session
+        self.run_test("Psychologist Recommendations", "GET", f"chat/{chat_session_id}/recommendations", 200)
+        
         # Test delete chat history
         self.run_test("Delete Chat History", "DELETE", f"chat/history/{chat_session_id}", 200)
 
@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime, timezone
+
+from analytics import Analytics
+from shared_state import InMemorySharedState
+
+AT = datetime(2025, 3, 4, 10, 15, tzinfo=timezone.utc)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class FailingSharedState(InMemorySharedState):
+    def __init__(self):
+        super().__init__()
+        self.failures = 1
+
+    async def add(self, key, value, ttl):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("mongo unavailable")
+        return await super().add(key, value, ttl)
+
+
+def started(db, shared_state):
+    analytics = Analytics()
+    analytics.db = db
+    analytics.shared_state = shared_state
+    return analytics
+
+
+def test_record_increments_daily_and_hourly_rollups(db):
+    async def scenario():
+        analytics = started(db, InMemorySharedState())
+        analytics.record({"bookings_confirmed": 1, "revenue": 1500}, {"psy_1": 1500}, at=AT)
+        analytics.record({"bookings_confirmed": 1, "revenue": 500}, {"psy_1": 500}, at=AT)
+        await analytics.stop()
+        day = await db.stats.find_one({"_id": "day:2025-03-04"})
+        hour = await db.stats.find_one({"_id": "hour:2025-03-04T10"})
+        assert day["counters"] == {"bookings_confirmed": 2, "revenue": 2000}
+        assert day["revenue_by_psychologist"] == {"psy_1": 2000}
+        assert hour["counters"] == {"bookings_confirmed": 2, "revenue": 2000}
+    run(scenario())
+
+
+def test_active_users_are_counted_once_per_day(db):
+    async def scenario():
+        shared_state = InMemorySharedState()
+        first, second = started(db, shared_state), started(db, shared_state)
+        for analytics in (first, second, first):
+            analytics.record_active_user("user_1", at=AT)
+        second.record_active_user("user_2", at=AT)
+        await first.stop()
+        await second.stop()
+        day = await db.stats.find_one({"_id": "day:2025-03-04"})
+        assert day["counters"]["active_users"] == 2
+    run(scenario())
+
+
+def test_shared_state_errors_do_not_lose_the_active_user(db):
+    async def scenario():
+        analytics = started(db, FailingSharedState())
+        analytics.record_active_user("user_1", at=AT)
+        await analytics.stop()
+        assert await db.stats.find_one({"_id": "day:2025-03-04"}) is None
+
+        analytics.record_active_user("user_1", at=AT)
+        await analytics.stop()
+        day = await db.stats.find_one({"_id": "day:2025-03-04"})
+        assert day["counters"]["active_users"] == 1
+    run(scenario())
+
+
+def test_backfill_confirmed_at(db):
+    async def scenario():
+        await db.bookings.insert_many([
+            {"booking_id": "b1", "status": "confirmed", "created_at": "2025-03-01T09:00:00+00:00"},
+            {"booking_id": "b2", "status": "confirmed", "created_at": "2025-03-01T09:00:00+00:00",
+             "confirmed_at": "2025-03-02T12:00:00+00:00"},
+            {"booking_id": "b3", "status": "pending", "created_at": "2025-03-01T09:00:00+00:00"},
+        ])
+        assert await Analytics.backfill_confirmed_at(db) == 1
+        assert await Analytics.backfill_confirmed_at(db) == 0
+        confirmed_at = {doc["booking_id"]: doc.get("confirmed_at") async for doc in db.bookings.find()}
+        assert confirmed_at == {
+            "b1": "2025-03-01T09:00:00+00:00",
+            "b2": "2025-03-02T12:00:00+00:00",
+            "b3": None,
+        }
+    run(scenario())
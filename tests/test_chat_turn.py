@@ -0,0 +1,128 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import integrations
+import server
+
+
+class FakeLlmChat:
+    reply = "I hear you."
+    fail = False
+
+    def __init__(self, **kwargs):
+        pass
+
+    def with_model(self, provider, model):
+        return self
+
+    async def send_message(self, message):
+        if FakeLlmChat.fail:
+            raise TimeoutError("model timed out")
+        return FakeLlmChat.reply
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def publish(self, *args):
+        self.calls.append(("publish", args))
+
+    def record(self, *args, **kwargs):
+        self.calls.append(("record", args))
+
+    def record_active_user(self, *args, **kwargs):
+        pass
+
+
+@pytest.fixture
+def chat_server(db, monkeypatch):
+    recorder = Recorder()
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "crisis_escalator", recorder)
+    monkeypatch.setattr(server, "analytics", recorder)
+    monkeypatch.setattr(integrations, "get_llm_chat", lambda: (FakeLlmChat, lambda text: text))
+    monkeypatch.setattr(FakeLlmChat, "fail", False)
+    return recorder
+
+
+USER = SimpleNamespace(user_id="user_1")
+
+
+def test_crisis_is_escalated_and_answered(chat_server, db):
+    result = asyncio.run(server.run_chat_turn(USER, "s1", "I want to die"))
+    assert result["is_crisis"] and result["helplines"]
+    published = [args for kind, args in chat_server.calls if kind == "publish"]
+    assert len(published) == 1
+    assert asyncio.run(db.chat_messages.count_documents({"message_id": published[0][2]})) == 1
+
+
+def test_crisis_is_escalated_and_helplines_returned_when_the_model_fails(chat_server, db, monkeypatch):
+    monkeypatch.setattr(FakeLlmChat, "fail", True)
+    with pytest.raises(HTTPException) as failed:
+        asyncio.run(server.run_chat_turn(USER, "s1", "I want to die"))
+    assert failed.value.status_code == 502
+    assert failed.value.detail["helplines"] == server.INDIA_HELPLINES
+    assert failed.value.detail["helpline_message"] == server.HELPLINE_MESSAGE
+    assert [kind for kind, _ in chat_server.calls].count("publish") == 1
+    assert asyncio.run(db.chat_messages.count_documents({"role": "user", "is_crisis": True})) == 1
+
+
+def test_ordinary_model_failure_is_a_plain_502(chat_server, monkeypatch):
+    monkeypatch.setattr(FakeLlmChat, "fail", True)
+    with pytest.raises(HTTPException) as failed:
+        asyncio.run(server.run_chat_turn(USER, "s1", "we keep arguing"))
+    assert failed.value.detail == "Failed to get a response"
+    assert not [kind for kind, _ in chat_server.calls if kind == "publish"]
+
+
+class FakeEmails:
+    def __init__(self, failing=()):
+        self.sent = []
+        self.failing = set(failing)
+
+    def send(self, params):
+        if params["to"][0] in self.failing:
+            raise ConnectionError("resend unavailable")
+        self.sent.append(params)
+
+
+@pytest.fixture
+def on_call(db, monkeypatch):
+    monkeypatch.setattr(server, "db", db)
+    asyncio.run(db.psychologists.insert_many([
+        {"email": f"psy{i}@example.com", "approved": True, "on_call": True} for i in range(3)
+    ]))
+
+    def use(emails):
+        monkeypatch.setattr(integrations, "get_resend", lambda: SimpleNamespace(Emails=emails))
+    return use
+
+
+EVENT = {"event_id": "crisis_1", "session_id": "s1", "created_at": "2025-01-01T00:00:00+00:00"}
+
+
+def test_alert_is_sent_separately_to_each_psychologist(on_call):
+    emails = FakeEmails()
+    on_call(emails)
+    assert asyncio.run(server.notify_on_call_psychologists(EVENT))
+    assert sorted(params["to"] for params in emails.sent) == [[f"psy{i}@example.com"] for i in range(3)]
+
+
+def test_alert_partial_and_total_failure(on_call):
+    emails = FakeEmails(failing={"psy0@example.com"})
+    on_call(emails)
+    assert asyncio.run(server.notify_on_call_psychologists(EVENT))
+    assert len(emails.sent) == 2
+
+    on_call(FakeEmails(failing={f"psy{i}@example.com" for i in range(3)}))
+    with pytest.raises(ConnectionError):
+        asyncio.run(server.notify_on_call_psychologists(EVENT))
+
+
+def test_no_one_on_call(db, monkeypatch):
+    monkeypatch.setattr(server, "db", db)
+    assert asyncio.run(server.notify_on_call_psychologists(EVENT)) is False
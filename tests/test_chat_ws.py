@@ -0,0 +1,136 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.testclient import TestClient
+
+from chat_ws import ChatConnection
+
+
+async def echo_turn(user, session_id, message):
+    return {"response": f"You said: {message}", "session_id": session_id}
+
+
+def make_client(**options):
+    app = FastAPI()
+
+    @app.websocket("/ws")
+    async def ws(websocket: WebSocket):
+        await websocket.accept()
+        await ChatConnection(websocket, SimpleNamespace(user_id="user_1"), echo_turn, **options).serve()
+
+    return TestClient(app)
+
+
+@pytest.fixture
+def client():
+    return make_client()
+
+
+def receive_until(ws, kind):
+    frames = []
+    while True:
+        frame = ws.receive_json()
+        frames.append(frame)
+        if frame["type"] == kind:
+            return frames
+
+
+def test_streams_a_turn(client):
+    with client.websocket_connect("/ws") as ws:
+        assert ws.receive_json() == {"type": "ready", "user_id": "user_1"}
+        ws.send_json({"type": "message", "session_id": "s1", "message": "hello there", "request_id": "r1"})
+        frames = receive_until(ws, "done")
+        tokens = "".join(frame["delta"] for frame in frames if frame["type"] == "token")
+        assert tokens == "You said: hello there"
+        assert frames[-1] == {"type": "done", "session_id": "s1", "request_id": "r1"}
+
+
+def test_closes_once_the_session_is_no_longer_valid():
+    checks = []
+
+    async def revalidate():
+        checks.append(True)
+        return len(checks) < 2
+
+    client = make_client(heartbeat_interval=0.05, revalidate=revalidate, revalidate_interval=0)
+    with client.websocket_connect("/ws") as ws:
+        ws.receive_json()
+        with pytest.raises(WebSocketDisconnect) as closed:
+            while True:
+                ws.receive_json()
+        assert closed.value.code == 4401
+    assert len(checks) == 2
+
+
+def test_revalidation_errors_keep_the_connection():
+    async def revalidate():
+        raise ConnectionError("database unavailable")
+
+    client = make_client(heartbeat_interval=0.05, revalidate=revalidate, revalidate_interval=0)
+    with client.websocket_connect("/ws") as ws:
+        ws.receive_json()
+        assert ws.receive_json() == {"type": "ping"}
+        assert ws.receive_json() == {"type": "ping"}
+
+
+def test_binary_and_malformed_frames_get_an_error_and_keep_the_connection(client):
+    with client.websocket_connect("/ws") as ws:
+        ws.receive_json()
+        ws.send_bytes(b"\x00\x01")
+        assert ws.receive_json()["code"] == "bad_frame"
+        ws.send_text("not json")
+        assert ws.receive_json()["code"] == "bad_frame"
+        ws.send_json(["not", "an", "object"])
+        assert ws.receive_json()["code"] == "bad_frame"
+        ws.send_json({"type": "ping"})
+        assert ws.receive_json() == {"type": "pong"}
+
+
+def test_rejects_messages_without_a_session(client):
+    with client.websocket_connect("/ws") as ws:
+        ws.receive_json()
+        ws.send_json({"type": "message", "message": "hi", "request_id": "r1"})
+        error = ws.receive_json()
+        assert error["code"] == "bad_message"
+        assert error["request_id"] == "r1"
+
+
+def test_websocket_origin_check(monkeypatch):
+    import server
+    monkeypatch.setattr(server, "CORS_ORIGINS", ["https://saathi.example"])
+    assert server.websocket_origin_allowed(None, "api.saathi.example")
+    assert server.websocket_origin_allowed("https://saathi.example", "api.saathi.example")
+    assert server.websocket_origin_allowed("https://api.saathi.example", "api.saathi.example")
+    assert not server.websocket_origin_allowed("https://evil.example", "api.saathi.example")
+
+    # A wildcard CORS setting does not open the socket to every site.
+    monkeypatch.setattr(server, "CORS_ORIGINS", ["*"])
+    assert not server.websocket_origin_allowed("https://evil.example", "api.saathi.example")
+
+
+def test_session_still_valid(db, monkeypatch):
+    import server
+    monkeypatch.setattr(server, "db", db)
+    now = datetime.now(timezone.utc)
+
+    async def scenario():
+        await db.users.insert_many([
+            {"user_id": "u1", "email": "u1@example.com", "name": "U1", "role": "admin", "created_at": now.isoformat()},
+        ])
+        await db.user_sessions.insert_one(
+            {"user_id": "u1", "session_token": "session_a", "expires_at": (now + timedelta(days=1)).isoformat()}
+        )
+        assert await server.session_still_valid("session_a", require_admin=True)
+
+        await db.users.update_one({"user_id": "u1"}, {"$set": {"role": "user"}})
+        assert await server.session_still_valid("session_a")
+        assert not await server.session_still_valid("session_a", require_admin=True)
+
+        await db.user_sessions.delete_one({"session_token": "session_a"})
+        assert not await server.session_still_valid("session_a")
+        assert not await server.session_still_valid(None)
+
+    asyncio.run(scenario())
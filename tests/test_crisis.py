@@ -0,0 +1,55 @@
+import asyncio
+
+from crisis import CrisisEscalator
+from shared_state import InMemorySharedState
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def escalate(db, notifier, messages):
+    escalator = CrisisEscalator()
+    escalator.start(db, InMemorySharedState(), notifier=notifier)
+    events = [escalator.publish(session_id, user_id, f"msg_{i}", "I want to die", ["want to die"])
+              for i, (user_id, session_id) in enumerate(messages)]
+    await escalator.stop()
+    return [await db.crisis_events.find_one({"event_id": event["event_id"]}, {"_id": 0}) for event in events]
+
+
+def test_alerts_once_per_user_and_session(db):
+    alerts = []
+
+    async def notifier(event):
+        alerts.append(event["event_id"])
+        return True
+
+    events = run(escalate(db, notifier, [("u1", "s1"), ("u1", "s1"), ("u2", "s1"), ("u1", "s2")]))
+    assert [event["notified"] for event in events] == [True, False, True, True]
+    assert alerts == [events[0]["event_id"], events[2]["event_id"], events[3]["event_id"]]
+
+
+def test_failed_delivery_is_retried_on_the_next_message(db):
+    attempts = []
+
+    async def notifier(event):
+        attempts.append(event["event_id"])
+        if len(attempts) == 1:
+            raise RuntimeError("email provider unavailable")
+        return True
+
+    events = run(escalate(db, notifier, [("u1", "s1"), ("u1", "s1")]))
+    assert len(attempts) == 2
+    assert [event["notified"] for event in events] == [False, True]
+
+
+def test_nobody_on_call_does_not_start_the_dedupe_window(db):
+    attempts = []
+
+    async def notifier(event):
+        attempts.append(event["event_id"])
+        return False
+
+    events = run(escalate(db, notifier, [("u1", "s1"), ("u1", "s1")]))
+    assert len(attempts) == 2
+    assert [event["notified"] for event in events] == [False, False]
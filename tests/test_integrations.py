@@ -0,0 +1,40 @@
+import asyncio
+import concurrent.futures
+import threading
+
+import integrations
+
+
+def test_load_waits_for_a_running_prewarm_without_blocking_the_loop(monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def slow_prewarm():
+        release.wait(5)
+        calls.append("prewarm")
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(integrations, "_prewarm", executor.submit(slow_prewarm))
+
+    async def scenario():
+        def getter():
+            calls.append("getter")
+            return "sdk"
+
+        loading = asyncio.ensure_future(integrations.load(getter))
+        ticks = 0
+        while ticks < 5:
+            await asyncio.sleep(0.01)
+            ticks += 1
+        assert not loading.done()
+        release.set()
+        assert await loading == "sdk"
+
+    asyncio.run(scenario())
+    executor.shutdown()
+    assert calls == ["prewarm", "getter"]
+
+
+def test_load_without_prewarm_calls_the_getter(monkeypatch):
+    monkeypatch.setattr(integrations, "_prewarm", None)
+    assert asyncio.run(integrations.load(lambda: "sdk")) == "sdk"
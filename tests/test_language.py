@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+from language import (
+    ENGLISH, HINGLISH, LanguageLayer, LocalTranslationBackend, crisis_matches, detect_language, normalize
+)
+
+ENGLISH_KEYWORDS = ["suicide", "kill myself", "want to die"]
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.mark.parametrize("text, language", [
+    ("My partner and I keep fighting about money", ENGLISH),
+    ("The main problem is my main job", ENGLISH),
+    ("Hum is the sound my fridge makes, main thing is I can't sleep", ENGLISH),
+    ("yaar mujhe samajh nahi aa raha kya karu", HINGLISH),
+    ("meri shaadi mein bahut problems hain", HINGLISH),
+    ("मुझे समझ नहीं आ रहा क्या करूं", "hi"),
+    ("আমি খুব একা বোধ করছি", "bn"),
+    ("எனக்கு மிகவும் கஷ்டமாக இருக்கிறது", "ta"),
+    ("मेरी family मुझे shaadi के लिए force कर रही है", "hi"),
+])
+def test_detect_language(text, language):
+    assert detect_language(text) == language
+
+
+def test_normalize_keeps_devanagari_matras():
+    assert normalize("  मैं,  जीना नहीं चाहता!! ") == "मैं जीना नहीं चाहता"
+
+
+@pytest.mark.parametrize("text", [
+    "I want to die",
+    "mujhe marna hai",
+    "ab mar jana hai mujhe",
+    "main jeena nahi chahta yaar",
+    "मुझे मरना है",
+    "मैं अब जीना नहीं चाहता",
+    "নিজেকে শেষ করে দিতে চাই, আত্মহত্যা",
+])
+def test_crisis_messages_are_flagged(text):
+    assert crisis_matches(text, detect_language(text), ENGLISH_KEYWORDS)
+
+
+@pytest.mark.parametrize("text", [
+    "The main problem is my main job",
+    "mujhe samajh nahi aa raha",
+    "मुझे समझ नहीं आ रहा",
+])
+def test_ordinary_messages_are_not_flagged(text):
+    assert crisis_matches(text, detect_language(text), ENGLISH_KEYWORDS) == []
+
+
+def test_script_switching_still_checks_english_and_hinglish():
+    assert crisis_matches("मैं बहुत परेशान हूँ, I want to die", "hi", ENGLISH_KEYWORDS) == ["want to die"]
+
+
+def test_system_prompt_is_unchanged_for_english_and_directed_otherwise():
+    layer = LanguageLayer(LocalTranslationBackend())
+    assert layer.system_prompt("Be kind.", ENGLISH) == "Be kind."
+    prompt = layer.system_prompt("Be kind.", "hi")
+    assert prompt.startswith("Be kind.") and "Hindi" in prompt
+    assert layer.system_prompt("Be kind.", "hi") is prompt
+
+
+def test_localize_translates_once_and_caches():
+    backend = LocalTranslationBackend({("hi", "You are not alone."): "आप अकेले नहीं हैं।"})
+    layer = LanguageLayer(backend)
+
+    async def scenario():
+        assert await layer.localize("You are not alone.", ENGLISH) == "You are not alone."
+        assert await layer.localize("You are not alone.", "hi") == "आप अकेले नहीं हैं।"
+        assert await layer.localize("You are not alone.", "hi") == "आप अकेले नहीं हैं।"
+        # Untranslatable text falls through unchanged.
+        assert await layer.localize("Unknown text", "hi") == "Unknown text"
+    run(scenario())
+    assert backend.calls == 2
+    assert layer.stats()["hits"] == 1
+    assert layer.stats()["misses"] == 2
+
+
+def test_concurrent_misses_share_one_translation():
+    class SlowBackend(LocalTranslationBackend):
+        async def translate(self, text, target):
+            await asyncio.sleep(0.02)
+            return await super().translate(text, target)
+
+    backend = SlowBackend({("ta", "Hello"): "வணக்கம்"})
+    layer = LanguageLayer(backend)
+
+    async def scenario():
+        return await asyncio.gather(*(layer.localize("Hello", "ta") for _ in range(8)))
+    assert run(scenario()) == ["வணக்கம்"] * 8
+    assert backend.calls == 1
+    assert layer.stats()["translations"]["coalescing_ratio"] == 0.875
+
+
+def test_cache_is_bounded_lru():
+    backend = LocalTranslationBackend()
+    layer = LanguageLayer(backend, cache_size=2)
+
+    async def scenario():
+        for text in ("a", "b", "a", "c", "a", "b"):
+            await layer.localize(text, "hi")
+    run(scenario())
+    # "b" was evicted when "c" arrived, because "a" had been used more recently.
+    assert backend.calls == 4
+    assert layer.stats()["entries"] == 2
+
+
+def test_translation_errors_fall_back_to_english_without_caching():
+    class FlakyBackend(LocalTranslationBackend):
+        async def translate(self, text, target):
+            await super().translate(text, target)
+            if self.calls == 1:
+                raise RuntimeError("translation service down")
+            return "अनुवाद"
+
+    backend = FlakyBackend()
+    layer = LanguageLayer(backend)
+
+    async def scenario():
+        assert await layer.localize("Call a helpline", "hi") == "Call a helpline"
+        assert await layer.localize("Call a helpline", "hi") == "अनुवाद"
+    run(scenario())
+    assert backend.calls == 2
@@ -0,0 +1,122 @@
+import asyncio
+from datetime import datetime, timezone, timedelta
+
+import pytest
+
+from otp import OTPError, OTPStore
+
+SECRET = "otp-test-secret-0123456789abcdef0123"
+EMAIL = "user@example.com"
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def store():
+    return OTPStore(SECRET, max_attempts=3, lockout=timedelta(minutes=15))
+
+
+def test_requires_a_dedicated_secret():
+    for secret in (None, "", "short"):
+        with pytest.raises(ValueError):
+            OTPStore(secret)
+
+
+def test_code_is_stored_hashed_and_consumed_once(db, store):
+    async def scenario():
+        await OTPStore.ensure_indexes(db)
+        code = await store.issue(db, EMAIL)
+        doc = await db.otp_codes.find_one({"email": EMAIL})
+        assert code not in str(doc)
+        assert doc["code_hash"] == store.hash_code(EMAIL, code)
+
+        await store.verify(db, EMAIL, code)
+        with pytest.raises(OTPError) as reused:
+            await store.verify(db, EMAIL, code)
+        assert reused.value.detail == "OTP not found"
+    run(scenario())
+
+
+def test_reissue_replaces_the_previous_code(db, store):
+    async def scenario():
+        first = await store.issue(db, EMAIL)
+        second = await store.issue(db, EMAIL)
+        if first != second:
+            with pytest.raises(OTPError):
+                await store.verify(db, EMAIL, first)
+        await store.verify(db, EMAIL, second)
+    run(scenario())
+
+
+def test_wrong_codes_lock_the_email_out(db, store):
+    async def scenario():
+        await OTPStore.ensure_indexes(db)
+        code = await store.issue(db, EMAIL)
+        wrong = "000000" if code != "000000" else "111111"
+        for _ in range(store.max_attempts - 1):
+            with pytest.raises(OTPError) as invalid:
+                await store.verify(db, EMAIL, wrong)
+            assert invalid.value.status_code == 400
+        with pytest.raises(OTPError) as locked:
+            await store.verify(db, EMAIL, wrong)
+        assert locked.value.status_code == 429
+
+        # The right code and a fresh one are both refused until the lockout ends.
+        with pytest.raises(OTPError) as still_locked:
+            await store.verify(db, EMAIL, code)
+        assert still_locked.value.status_code == 429
+        with pytest.raises(OTPError) as reissue:
+            await store.issue(db, EMAIL)
+        assert reissue.value.status_code == 429
+
+        doc = await db.otp_codes.find_one({"email": EMAIL})
+        assert doc["purge_at"] >= doc["locked_until"]
+    run(scenario())
+
+
+def test_lockout_expires(db, store):
+    async def scenario():
+        await OTPStore.ensure_indexes(db)
+        await store.issue(db, EMAIL)
+        for _ in range(store.max_attempts):
+            with pytest.raises(OTPError):
+                await store.verify(db, EMAIL, "not-a-code")
+        past = datetime.now(timezone.utc) - timedelta(seconds=1)
+        await db.otp_codes.update_one({"email": EMAIL}, {"$set": {"locked_until": past}})
+
+        code = await store.issue(db, EMAIL)
+        await store.verify(db, EMAIL, code)
+    run(scenario())
+
+
+def test_expired_code_is_rejected(db, store):
+    async def scenario():
+        code = await store.issue(db, EMAIL)
+        past = datetime.now(timezone.utc) - timedelta(seconds=1)
+        await db.otp_codes.update_one({"email": EMAIL}, {"$set": {"expires_at": past}})
+        with pytest.raises(OTPError) as expired:
+            await store.verify(db, EMAIL, code)
+        assert expired.value.detail == "OTP expired"
+    run(scenario())
+
+
+def test_unknown_email(db, store):
+    with pytest.raises(OTPError) as missing:
+        run(store.verify(db, "nobody@example.com", "123456"))
+    assert missing.value.detail == "OTP not found"
+
+
+def test_server_builds_the_store_lazily(monkeypatch):
+    import server
+    from fastapi import HTTPException
+    monkeypatch.setattr(server, "otp_store", None)
+    monkeypatch.setattr(server, "OTP_SECRET", None)
+    with pytest.raises(HTTPException) as unavailable:
+        server.get_otp_store()
+    assert unavailable.value.status_code == 503
+
+    monkeypatch.setattr(server, "OTP_SECRET", SECRET)
+    store = server.get_otp_store()
+    assert server.get_otp_store() is store
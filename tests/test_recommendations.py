@@ -0,0 +1,153 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from recommendations import TOPICS, PsychologistIndex, topic_labels, topic_vector
+
+
+def labels(*texts):
+    return topic_labels(topic_vector(texts))
+
+
+@pytest.mark.parametrize("text", [
+    "Give me a moment",
+    "a couple of bad days at work",
+    "the argon lamp in the lab",
+    "I read the lies of Locke",
+])
+def test_keywords_do_not_match_inside_longer_words(text):
+    assert "family_pressure" not in labels(text)
+    assert "marriage_conflict" not in labels(text)
+
+
+def test_whole_words_and_deliberate_stems():
+    assert labels("my dadi passed away") == ["grief"]
+    assert labels("my mom and dad keep pushing a rishta") == ["family_pressure"]
+    assert labels("we went to couples therapy") == ["marriage_conflict"]
+    assert "communication" in labels("we keep arguing and fighting")
+    assert "compatibility" in labels("are we even compatible?")
+    assert "loneliness_stress" in labels("so much sadness, I feel depressed")
+    assert "trust_issues" in labels("he cheated and I feel betrayed")
+
+
+def test_topic_vector_normalises_and_decays():
+    assert not topic_vector([]).any()
+    assert not topic_vector(["hello there"]).any()
+    weights = topic_vector(["my husband", "my parents"])
+    assert weights.sum() == pytest.approx(1.0)
+    marriage, family = TOPICS.index("marriage_conflict"), TOPICS.index("family_pressure")
+    # Newest message first, so it outweighs the older one.
+    assert weights[marriage] > weights[family]
+
+
+def test_topic_labels_threshold_and_order():
+    weights = np.zeros(len(TOPICS), dtype=np.float32)
+    weights[TOPICS.index("grief")] = 0.6
+    weights[TOPICS.index("breakup")] = 0.35
+    weights[TOPICS.index("communication")] = 0.05
+    assert topic_labels(weights) == ["grief", "breakup"]
+
+
+PSYCHOLOGISTS = [
+    {"psychologist_id": "p_marriage", "name": "A", "specialization": ["Marriage counselling"], "pricing": 1500, "rating": 4.5},
+    {"psychologist_id": "p_breakup", "name": "B", "specialization": ["Breakup recovery"], "pricing": 800, "rating": 4.0},
+    {"psychologist_id": "p_grief", "name": "C", "specialization": ["Grief and bereavement"], "pricing": 1200, "rating": 5.0},
+]
+
+
+@pytest.fixture
+def index():
+    index = PsychologistIndex()
+    index.replace_all(PSYCHOLOGISTS, {})
+    return index
+
+
+def test_recommend_prefers_matching_specialisation(index):
+    results = index.recommend(topic_vector(["my husband and I fight about our marriage"]), limit=2)
+    assert [r["psychologist_id"] for r in results][0] == "p_marriage"
+    assert "marriage_conflict" in results[0]["matched_topics"]
+    assert len(results) == 2
+    assert set(results[0]) >= {"name", "pricing", "score", "matched_topics"}
+
+
+def test_recommend_max_price_and_limits(index):
+    weights = topic_vector(["my marriage is falling apart"])
+    assert [r["psychologist_id"] for r in index.recommend(weights, limit=3, max_price=1000)] == ["p_breakup"]
+    assert index.recommend(weights, max_price=100) == []
+    assert index.recommend(weights, limit=0) == []
+    assert len(index.recommend(weights, limit=10)) == 3
+
+
+def test_recommend_on_an_empty_index():
+    assert PsychologistIndex().recommend(topic_vector(["breakup"])) == []
+
+
+def test_upsert_adds_and_updates(index):
+    weights = topic_vector(["my parents are forcing an arranged marriage"])
+    index.upsert({"psychologist_id": "p_family", "name": "D", "specialization": ["Family pressure"], "pricing": 900, "rating": 4.8})
+    assert len(index) == 4
+    assert index.recommend(weights, limit=1)[0]["psychologist_id"] == "p_family"
+
+    index.upsert({"psychologist_id": "p_family", "name": "D", "specialization": ["Family pressure"], "pricing": 5000, "rating": 4.8})
+    assert len(index) == 4
+    assert all(r["psychologist_id"] != "p_family" for r in index.recommend(weights, max_price=2000))
+
+
+def test_note_booking_lowers_availability(index):
+    weights = topic_vector(["my marriage"])
+    before = index.recommend(weights, limit=3)[0]
+    for _ in range(5):
+        index.note_booking("p_marriage")
+    index.note_booking("unknown")
+    after = {r["psychologist_id"]: r["score"] for r in index.recommend(weights, limit=3)}
+    assert after["p_marriage"] < before["score"]
+    for _ in range(10):
+        index.note_booking("p_marriage", -1)
+    restored = {r["psychologist_id"]: r["score"] for r in index.recommend(weights, limit=3)}
+    assert restored["p_marriage"] == before["score"]
+
+
+class SlowCursor:
+    def __init__(self, docs, release):
+        self.docs = docs
+        self.release = release
+
+    async def to_list(self, length):
+        await self.release.wait()
+        return list(self.docs)
+
+
+class SlowDB:
+    """psychologists/bookings stand-ins whose reads resolve only when released."""
+
+    def __init__(self, psychologists):
+        self.release = asyncio.Event()
+        self.psychologists = type("Psychologists", (), {"find": lambda _, *a, **k: SlowCursor(psychologists, self.release)})()
+        self.bookings = type("Bookings", (), {"aggregate": lambda _, *a, **k: SlowCursor([], self.release)})()
+
+
+def test_rebuild_keeps_approvals_made_while_it_runs():
+    async def scenario():
+        index = PsychologistIndex()
+        db = SlowDB(PSYCHOLOGISTS)
+        rebuild = asyncio.ensure_future(index.rebuild(db))
+        await asyncio.sleep(0)
+        index.upsert({"psychologist_id": "p_new", "name": "E", "specialization": ["Trust issues"], "pricing": 700, "rating": 4.0})
+        db.release.set()
+        await rebuild
+        assert len(index) == 4
+        assert index.recommend(topic_vector(["he cheated on me"]), limit=1)[0]["psychologist_id"] == "p_new"
+        assert not index.is_stale()
+    asyncio.run(scenario())
+
+
+def test_rebuild_from_mongo(db):
+    async def scenario():
+        await db.psychologists.insert_many([dict(doc, approved=True) for doc in PSYCHOLOGISTS])
+        await db.psychologists.insert_one({"psychologist_id": "p_pending", "name": "F", "approved": False})
+        await db.bookings.insert_one({"psychologist_id": "p_grief", "status": "confirmed", "slot_date": "2999-01-01"})
+        index = PsychologistIndex()
+        await index.rebuild(db)
+        assert len(index) == 3
+    asyncio.run(scenario())
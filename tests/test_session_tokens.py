@@ -0,0 +1,83 @@
+import asyncio
+from datetime import datetime, timezone, timedelta
+
+import jwt
+import pytest
+
+from session_tokens import SIGNED_TOKEN_PREFIX, InvalidSessionToken, RevocationList, SessionTokenCodec
+
+SECRET = "session-test-secret-0123456789abcdef"
+USER = {
+    "user_id": "user_1",
+    "email": "user@example.com",
+    "name": "Test User",
+    "role": "admin",
+    "created_at": datetime(2025, 1, 1, tzinfo=timezone.utc),
+}
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_requires_a_real_secret():
+    for secret in (None, "", "saathi_secret", "saathi_jwt_secret_key_2025"):
+        with pytest.raises(ValueError):
+            SessionTokenCodec(secret)
+
+
+def test_round_trip():
+    codec = SessionTokenCodec(SECRET)
+    claims = codec.decode(codec.issue(USER))
+    fields = codec.user_fields(claims)
+    assert fields["user_id"] == "user_1"
+    assert fields["role"] == "admin"
+    assert fields["created_at"] == USER["created_at"].isoformat()
+
+
+def test_rejects_tokens_signed_with_another_key():
+    forged = SIGNED_TOKEN_PREFIX + jwt.encode(
+        {"sub": "attacker", "role": "admin", "jti": "x", "iat": 0, "exp": 2**31},
+        "attacker-chosen-secret-0123456789abcdef",
+        algorithm="HS256",
+    )
+    with pytest.raises(InvalidSessionToken):
+        SessionTokenCodec(SECRET).decode(forged)
+
+
+def test_rejects_expired_tokens():
+    codec = SessionTokenCodec(SECRET, ttl=timedelta(seconds=-1))
+    with pytest.raises(InvalidSessionToken):
+        codec.decode(codec.issue(USER))
+
+
+def test_logout_revokes_one_token(db):
+    codec = SessionTokenCodec(SECRET)
+    revocations = RevocationList(refresh_interval=3600)
+
+    async def scenario():
+        revoked = codec.decode(codec.issue(USER))
+        other = codec.decode(codec.issue(USER))
+        await revocations.revoke(db, revoked)
+        assert await revocations.is_revoked(db, revoked)
+        assert not await revocations.is_revoked(db, other)
+    run(scenario())
+
+
+def test_user_revocation_rejects_earlier_tokens_on_every_worker(db):
+    codec = SessionTokenCodec(SECRET)
+    admin_worker = RevocationList(refresh_interval=3600)
+    other_worker = RevocationList(refresh_interval=0)
+
+    async def scenario():
+        old = codec.decode(codec.issue(USER))
+        assert not await other_worker.is_revoked(db, old)
+        await admin_worker.revoke_user(db, USER["user_id"], timedelta(days=7))
+        assert await admin_worker.is_revoked(db, old)
+        assert await other_worker.is_revoked(db, old)
+
+        later = dict(old, jti="later", iat=old["iat"] + 2)
+        assert not await other_worker.is_revoked(db, later)
+        someone_else = dict(old, sub="user_2")
+        assert not await other_worker.is_revoked(db, someone_else)
+    run(scenario())
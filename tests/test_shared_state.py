@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+from shared_state import InMemorySharedState, MongoSharedState, create_shared_state
+
+TTL = 0.2
+
+
+@pytest.fixture(params=["memory", "mongo"])
+def make_state(request, db):
+    def make():
+        if request.param == "memory":
+            return InMemorySharedState()
+        return MongoSharedState(db)
+    return make
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_get_set_delete(make_state):
+    async def scenario():
+        state = make_state()
+        await state.setup()
+        assert await state.get("k") is None
+        await state.set("k", {"v": 1}, 60)
+        assert await state.get("k") == {"v": 1}
+        await state.delete("k")
+        assert await state.get("k") is None
+    run(scenario())
+
+
+def test_add_only_sets_absent_or_expired_keys(make_state):
+    async def scenario():
+        state = make_state()
+        assert await state.add("k", "first", TTL)
+        assert not await state.add("k", "second", TTL)
+        assert await state.get("k") == "first"
+        await asyncio.sleep(TTL * 1.5)
+        assert await state.get("k") is None
+        assert await state.add("k", "third", TTL)
+        assert await state.get("k") == "third"
+    run(scenario())
+
+
+def test_add_is_exclusive_under_concurrency(make_state):
+    async def scenario():
+        state = make_state()
+        results = await asyncio.gather(*(state.add("k", i, 60) for i in range(20)))
+        assert results.count(True) == 1
+    run(scenario())
+
+
+def test_incr_counts_within_a_window_and_restarts_after_it(make_state):
+    async def scenario():
+        state = make_state()
+        assert await state.incr("c", 1, TTL) == 1
+        assert await state.incr("c", 2, TTL) == 3
+        # Increments do not extend the window.
+        await asyncio.sleep(TTL * 1.5)
+        assert await state.incr("c", 1, TTL) == 1
+    run(scenario())
+
+
+def test_concurrent_increments_are_not_lost(make_state):
+    async def scenario():
+        state = make_state()
+        await asyncio.gather(*(state.incr("c", 1, 60) for _ in range(25)))
+        assert await state.get("c") == 25
+    run(scenario())
+
+
+def test_hit_rate_limit(make_state):
+    async def scenario():
+        state = make_state()
+        hits = [await state.hit_rate_limit("otp:a@example.com", 3, 60) for _ in range(5)]
+        assert hits == [False, False, False, True, True]
+        assert not await state.hit_rate_limit("otp:b@example.com", 3, 60)
+    run(scenario())
+
+
+def test_lock_is_exclusive_and_released(make_state):
+    async def scenario():
+        state = make_state()
+        order = []
+
+        async def worker(name):
+            async with state.lock("job", ttl=5, timeout=2, poll_interval=0.01):
+                order.append(f"{name}:in")
+                await asyncio.sleep(0.05)
+                order.append(f"{name}:out")
+
+        await asyncio.gather(worker("a"), worker("b"))
+        assert order in (["a:in", "a:out", "b:in", "b:out"], ["b:in", "b:out", "a:in", "a:out"])
+        assert await state.get("lock:job") is None
+    run(scenario())
+
+
+def test_lock_times_out_and_only_the_owner_unlocks(make_state):
+    async def scenario():
+        state = make_state()
+        owner = await state.try_lock("job", 60)
+        assert owner
+        with pytest.raises(TimeoutError):
+            async with state.lock("job", timeout=0.05, poll_interval=0.01):
+                pass
+        await state.unlock("job", "someone-else")
+        assert await state.get("lock:job") == owner
+        await state.unlock("job", owner)
+        assert await state.try_lock("job", 60)
+    run(scenario())
+
+
+def test_expired_lock_can_be_taken_over(make_state):
+    async def scenario():
+        state = make_state()
+        assert await state.try_lock("job", TTL)
+        await asyncio.sleep(TTL * 1.5)
+        assert await state.try_lock("job", 60)
+    run(scenario())
+
+
+def test_create_shared_state(db):
+    assert isinstance(create_shared_state("memory", db), InMemorySharedState)
+    assert isinstance(create_shared_state("mongo", db), MongoSharedState)
+    with pytest.raises(ValueError):
+        create_shared_state("redis", db)
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_calls_for_a_key_share_one_execution():
+    async def scenario():
+        flight = SingleFlight()
+        executions = 0
+
+        async def load():
+            nonlocal executions
+            executions += 1
+            await asyncio.sleep(0.02)
+            return {"value": 42}
+
+        results = await asyncio.gather(*(flight.do("auth", "token", load) for _ in range(10)))
+        assert executions == 1
+        assert all(result is results[0] for result in results)
+
+        stats = flight.stats()
+        assert stats["in_flight"] == 0
+        assert stats["groups"]["auth"] == {"calls": 10, "executions": 1, "coalesced": 9, "coalescing_ratio": 0.9}
+    run(scenario())
+
+
+def test_different_keys_and_groups_do_not_coalesce():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def load(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(
+            flight.do("auth", "a", lambda: load("a")),
+            flight.do("auth", "b", lambda: load("b")),
+            flight.do("stories", "a", lambda: load("story")),
+        )
+        assert results == ["a", "b", "story"]
+        assert flight.stats()["executions"] == 3
+        assert flight.stats()["coalescing_ratio"] == 0.0
+    run(scenario())
+
+
+def test_sequential_calls_execute_again():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def load():
+            calls.append(1)
+            return len(calls)
+
+        assert await flight.do("g", "k", load) == 1
+        assert await flight.do("g", "k", load) == 2
+    run(scenario())
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(*(flight.do("g", "k", fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert flight.stats()["executions"] == 1
+
+        async def succeed():
+            return "ok"
+        assert await flight.do("g", "k", succeed) == "ok"
+    run(scenario())
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_call():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def load():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        first = asyncio.ensure_future(flight.do("g", "k", load))
+        second = asyncio.ensure_future(flight.do("g", "k", load))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert await second == "done"
+    run(scenario())
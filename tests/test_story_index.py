@@ -0,0 +1,101 @@
+import asyncio
+
+from story_index import StoryIndex, stem, tokenize
+
+STORIES = [
+    {"story_id": "s1", "category": "breakup", "content": "After our breakup I felt lost, but talking to friends helped me heal."},
+    {"story_id": "s2", "category": "marriage", "content": "My husband and I fought about money until counselling taught us to listen."},
+    {"story_id": "s3", "category": "family", "content": "My parents pressured me into an arranged marriage and I learned to set boundaries."},
+]
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_stem_and_tokenize():
+    assert stem("fighting") == "fight"
+    assert stem("talked") == "talk"
+    assert stem("parents") == "parent"
+    # Short words keep their suffix so "is" or "bus" are not mangled.
+    assert stem("bus") == "bus"
+    assert tokenize("I was FIGHTING with my parents, a lot!") == ["fight", "parent", "lot"]
+
+
+def test_search_ranks_the_most_similar_story_first():
+    index = StoryIndex()
+    index.replace_all(STORIES)
+    results = index.search("we keep fighting about money in our marriage")
+    assert results[0]["story_id"] == "s2"
+    assert results[0]["score"] >= results[-1]["score"]
+
+
+def test_k_and_min_score():
+    index = StoryIndex()
+    index.replace_all(STORIES)
+    assert len(index.search("breakup marriage parents", k=2, min_score=0.0)) == 2
+    assert len(index.search("breakup marriage parents", k=10, min_score=0.0)) == 3
+    assert index.search("breakup", k=0) == []
+    assert index.search("breakup", min_score=1.01) == []
+    # Stopwords and unknown words match nothing.
+    assert index.search("the and of") == []
+    assert index.search("zyxwv qwert") == []
+    assert StoryIndex().search("breakup") == []
+
+
+def test_add_after_replace_all_and_duplicates():
+    index = StoryIndex()
+    index.replace_all(STORIES[:2])
+    index.add(STORIES[2])
+    index.add(STORIES[2])
+    assert len(index) == 3
+    assert index.search("arranged marriage boundaries")[0]["story_id"] == "s3"
+
+
+def test_buffer_grows_past_its_initial_capacity():
+    index = StoryIndex(dim=256)
+    for i in range(40):
+        index.add({"story_id": f"s{i}", "category": "misc", "content": f"story number{i} about topic{i}"})
+    assert len(index) == 40
+    assert index.search("topic37")[0]["story_id"] == "s37"
+
+
+class SlowStories:
+    """A success_stories collection whose find() resolves only when released."""
+
+    def __init__(self, stories):
+        self.stories = stories
+        self.release = asyncio.Event()
+
+    def find(self, *args, **kwargs):
+        return self
+
+    async def to_list(self, length):
+        await self.release.wait()
+        return list(self.stories)
+
+
+def test_story_approved_during_a_rebuild_is_kept():
+    async def scenario():
+        index = StoryIndex()
+        collection = SlowStories(STORIES[:2])
+        rebuild = asyncio.ensure_future(index.rebuild(type("DB", (), {"success_stories": collection})()))
+        await asyncio.sleep(0)
+        index.add(STORIES[2])
+        collection.release.set()
+        await rebuild
+        assert len(index) == 3
+        assert index.search("arranged marriage boundaries")[0]["story_id"] == "s3"
+    run(scenario())
+
+
+def test_rebuild_from_mongo(db):
+    async def scenario():
+        await db.success_stories.insert_many([dict(story, approved=True) for story in STORIES])
+        await db.success_stories.insert_one({"story_id": "s4", "content": "pending story", "approved": False})
+        index = StoryIndex()
+        assert index.is_stale()
+        await index.rebuild(db)
+        assert len(index) == 3
+        assert not index.is_stale()
+    run(scenario())